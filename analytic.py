@@ -0,0 +1,165 @@
+# analytic.py
+# Event driven runner: DRIVE, TURN and SPINTO are constant velocity motions, so their
+# completion time and end pose are computed in closed form instead of stepped frame by frame.
+# GOTO couples turning and driving, and PLANTO runs a planned path of GOTOs, so both are
+# still integrated with the CommandExecutor.
+
+import math
+
+from commands import CommandExecutor, compile_commands, DRIVE, TURN, GOTO, SPINTO, PLANTO, FORWARD, LEFT
+from commands import POS_TOLERANCE, HEADING_TOLERANCE, AIM_TOLERANCE
+from headless import SimResult, DEFAULT_DT, DEFAULT_MAX_TIME
+from utils import angle_between_positions, smallest_angle_difference, CCW
+
+
+def time_to_reach(offset, rate, tolerance):
+    """
+    Time for a value moving at rate to come within tolerance of offset, starting from 0.
+    Returns None if it never gets there.
+    """
+    if abs(offset) <= tolerance:
+        return 0.0
+    if rate == 0 or (offset > 0) != (rate > 0):
+        return None
+    return (abs(offset) - tolerance) / abs(rate)
+
+
+def move_drive(pose, cmd_info, time):
+    """
+    Pose after a DRIVE starting at pose has run for time seconds, finished or not.
+    The TURN and SPINTO versions work the same way.
+    """
+    x, y, heading = pose
+    current_cmd, direction, distance, velocity = cmd_info
+    travelled = velocity * time * (1 if direction == FORWARD else -1)
+    heading_rad = math.radians(heading)
+    return x + travelled * math.cos(heading_rad), y + travelled * math.sin(heading_rad), heading
+
+
+def move_turn(pose, cmd_info, time):
+    x, y, heading = pose
+    current_cmd, direction, distance, velocity = cmd_info
+    return x, y, heading + velocity * time * (1 if direction == LEFT else -1)
+
+
+def move_spinto(pose, cmd_info, time):
+    x, y, heading = pose
+    current_cmd, target_x, target_y, velocity = cmd_info
+    angle_to_target = angle_between_positions((x, y), (target_x, target_y))
+    angle_diff, direction = smallest_angle_difference(angle_to_target, heading)
+    if angle_diff < AIM_TOLERANCE:
+        return pose
+    return x, y, heading + velocity * time * (1 if direction == CCW else -1)
+
+
+def solve_drive(pose, cmd_info, pos_tolerance=POS_TOLERANCE):
+    """
+    Returns (duration, (x, y, heading)) for a DRIVE starting at pose, or None if it never finishes.
+    The TURN and SPINTO solvers work the same way.
+    """
+    current_cmd, direction, distance, velocity = cmd_info
+    # both the target and the motion lie along the direction of travel
+    duration = time_to_reach(distance, velocity, pos_tolerance)
+    if duration is None:
+        return None
+    return duration, move_drive(pose, cmd_info, duration)
+
+
+def solve_turn(pose, cmd_info, pos_tolerance=POS_TOLERANCE):
+    current_cmd, direction, distance, velocity = cmd_info
+    duration = time_to_reach(distance, velocity, HEADING_TOLERANCE)
+    if duration is None:
+        return None
+    return duration, move_turn(pose, cmd_info, duration)
+
+
+def solve_spinto(pose, cmd_info, pos_tolerance=POS_TOLERANCE):
+    x, y, heading = pose
+    current_cmd, target_x, target_y, velocity = cmd_info
+    angle_to_target = angle_between_positions((x, y), (target_x, target_y))
+    angle_diff, direction = smallest_angle_difference(angle_to_target, heading)
+    if angle_diff < AIM_TOLERANCE:
+        return 0.0, pose
+    duration = time_to_reach(angle_diff, velocity, AIM_TOLERANCE)
+    if duration is None:
+        return None
+    return duration, move_spinto(pose, cmd_info, duration)
+
+
+# (solver, motion) for each command with a closed form
+SOLVERS = {
+    DRIVE: (solve_drive, move_drive),
+    TURN: (solve_turn, move_turn),
+    SPINTO: (solve_spinto, move_spinto),
+}
+
+
+# commands without a closed form, stepped by integrate_stepped
+STEPPED = (GOTO, PLANTO)
+
+
+def integrate_stepped(robot, cmd_info, dt, max_time, pos_tolerance=POS_TOLERANCE, trajectory=None, planner=None):
+    """
+    Step a single command with the CommandExecutor. Returns (duration, steps, completed).
+    """
+    executor = CommandExecutor([cmd_info], pos_tolerance=pos_tolerance, planner=planner)
+    elapsed = 0.0
+    steps = 0
+    max_steps = int(round(max_time / dt))
+    while not executor.done and steps < max_steps:
+        executor.step(robot)
+        robot.update_position(dt)
+        elapsed += dt
+        steps += 1
+        if trajectory is not None:
+            trajectory.append((elapsed, robot.x, robot.y, robot.heading))
+    return elapsed, steps, executor.done
+
+
+def run_event_driven(robot, cmds, goto_dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME, pos_tolerance=POS_TOLERANCE,
+                     planner=None):
+    """
+    Run cmds on robot, jumping straight to the end of each DRIVE, TURN and SPINTO.
+    GOTO and PLANTO are stepped every goto_dt seconds, PLANTO uses planner as the CommandExecutor does.
+    Returns a SimResult whose trajectory holds one entry per command end plus every GOTO and PLANTO step.
+    """
+    # unknown commands and bad arguments raise ValueError here, as they do in the CommandExecutor
+    cmds = compile_commands(cmds)
+    sim_time = 0.0
+    steps = 0
+    trajectory = []
+    cmd_end_times = []
+    completed = True
+    for cmd_index, cmd_info in enumerate(cmds):
+        current_cmd = cmd_info[0]
+        if current_cmd in STEPPED:
+            stepped = []
+            duration, n, completed = integrate_stepped(robot, cmd_info, goto_dt, max_time - sim_time,
+                                                       pos_tolerance=pos_tolerance, trajectory=stepped,
+                                                       planner=planner)
+            trajectory.extend((sim_time + t, x, y, heading, cmd_index) for t, x, y, heading in stepped)
+            steps += n
+        elif current_cmd in SOLVERS:
+            solve, move = SOLVERS[current_cmd]
+            pose = (robot.x, robot.y, robot.heading)
+            solution = solve(pose, cmd_info, pos_tolerance)
+            completed = solution is not None and sim_time + solution[0] <= max_time
+            if not completed:
+                # the command does not finish in time, stop the robot part way as a stepped run would
+                duration = max_time - sim_time
+                robot.x, robot.y, robot.heading = move(pose, cmd_info, duration)
+            else:
+                duration, (robot.x, robot.y, robot.heading) = solution
+            steps += 1
+        else:
+            raise ValueError(f"no event driven model for {current_cmd}")
+
+        sim_time += duration
+        robot.velocity = 0
+        robot.heading_velocity = 0
+        if not completed:
+            break
+        cmd_end_times.append(sim_time)
+        trajectory.append((sim_time, robot.x, robot.y, robot.heading, cmd_index + 1))
+
+    return SimResult(robot, completed, sim_time, steps, trajectory, cmd_end_times)
@@ -0,0 +1,88 @@
+# array_utils.py
+# NumPy versions of the utils.py geometry functions.
+# Each one takes arrays (or scalars) and broadcasts like any NumPy operation,
+# with the same conventions and wraparound rules as the scalar function of the same name.
+# Positions are arrays whose last axis is (x, y).
+
+import numpy as np
+
+from utils import CW, CCW, FORWARD, REVERSE
+
+
+def _xy(pos):
+    pos = np.asarray(pos, dtype=np.float64)
+    return pos[..., 0], pos[..., 1]
+
+
+def angle_between_positions(pos1, pos2):
+    """
+    Angles in degrees from pos1 to pos2, 0° along the positive x-axis, increasing counter-clockwise.
+    """
+    x1, y1 = _xy(pos1)
+    x2, y2 = _xy(pos2)
+    return np.degrees(np.arctan2(y2 - y1, x2 - x1))
+
+
+def smallest_angle_difference(target_angle, current_angle):
+    """
+    Returns (angle_diff, direction) arrays: the smallest difference in degrees (always positive)
+    and CW or CCW for the shortest rotation from current_angle to target_angle.
+    """
+    diff = np.mod(np.asarray(target_angle, dtype=np.float64) - current_angle, 360)
+    cw = diff > 180
+    angle_diff = np.where(cw, 360 - diff, diff)
+    direction = np.where(cw, CW, CCW)
+    return angle_diff, direction
+
+
+def _wrap_once(heading):
+    # the scalar versions add or subtract 360 once, and assert the result is in range
+    heading = np.where(heading > 180, heading - 360, heading)
+    heading = np.where(heading < -180, heading + 360, heading)
+    if np.any(np.abs(heading) > 180):
+        raise AssertionError("heading out of range")
+    return heading
+
+
+def cartesian_heading_to_gps(heading):
+    """
+    Cartesian headings (0° at positive x-axis, counter-clockwise) to GPS headings (0° at positive y-axis, clockwise).
+    """
+    return _wrap_once((np.asarray(heading, dtype=np.float64) - 90.0) * -1.0)
+
+
+def gps_heading_to_cartesian(heading):
+    """
+    GPS headings (0° at positive y-axis, clockwise) to Cartesian headings (0° at positive x-axis, counter-clockwise).
+    """
+    return _wrap_once((np.asarray(heading, dtype=np.float64) * -1.0) + 90.0)
+
+
+def cartesian_to_screen(x, y, screen_width=800, screen_height=800):
+    """
+    Cartesian coordinates (0,0 at center, y up) to integer pygame screen coordinates (0,0 at top-left, y down).
+    Returns (screen_x, screen_y) arrays.
+    """
+    screen_x = screen_width // 2 + np.trunc(x).astype(np.int64)
+    screen_y = screen_height // 2 - np.trunc(y).astype(np.int64)
+    return screen_x, screen_y
+
+
+def add_distance(current_pos, direction, distance, heading):
+    """
+    Positions distance units FORWARD or REVERSE along heading (degrees) from current_pos.
+    Takes the heading itself rather than a Robot. Unrecognized directions do not move.
+    Returns an array of positions.
+    """
+    x, y = _xy(current_pos)
+    direction = np.asarray(direction)
+    sign = np.where(direction == FORWARD, 1.0, np.where(direction == REVERSE, -1.0, 0.0))
+    heading_rad = np.radians(heading)
+    step = sign * np.asarray(distance, dtype=np.float64)
+    return np.stack(np.broadcast_arrays(x + step * np.cos(heading_rad), y + step * np.sin(heading_rad)), axis=-1)
+
+
+def find_distance(pos1, pos2):
+    x1, y1 = _xy(pos1)
+    x2, y2 = _xy(pos2)
+    return np.hypot(x2 - x1, y2 - y1)
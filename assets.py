@@ -0,0 +1,23 @@
+# assets.py
+# Process-wide cache of loaded and scaled images.
+# pygame is only imported when an image is first needed, so headless runs never load it.
+
+_images = {}
+
+
+def load_image(image_file, size):
+    """
+    The image in image_file scaled to size (width, height).
+    Every caller asking for the same file and size gets the same surface, so treat it as read only.
+    """
+    key = (image_file, tuple(size))
+    image = _images.get(key)
+    if image is None:
+        import pygame
+        image = pygame.transform.scale(pygame.image.load(image_file), key[1])
+        _images[key] = image
+    return image
+
+
+def clear():
+    _images.clear()
@@ -0,0 +1,160 @@
+# benchmarks.py
+# Timing of the simulator hot paths, compared against a saved baseline.
+#
+#   python benchmarks.py --save        measure and save bench_baseline.json
+#   python benchmarks.py               measure and fail if anything got slower than the threshold
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from robot import Robot
+from commands import MAIN_CMDS
+from headless import run_headless
+from utils import angle_between_positions, smallest_angle_difference, find_distance, cartesian_to_screen
+
+BASELINE_FILE = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.25  # fail when a metric is this much slower than the baseline
+REPEATS = 5  # best of this many timing runs
+
+
+def time_per_call(func, number, repeats=REPEATS):
+    """
+    Best time in seconds for one call of func, over repeats runs of number calls.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def bench_update_position():
+    robot = Robot(x=0, y=0, heading=10, velocity=10, heading_velocity=5)
+    return time_per_call(lambda: robot.update_position(1 / 60), 20000)
+
+
+def bench_angle_between_positions():
+    return time_per_call(lambda: angle_between_positions((10, 20), (-30, 45)), 20000)
+
+
+def bench_smallest_angle_difference():
+    return time_per_call(lambda: smallest_angle_difference(-170, 170), 20000)
+
+
+def bench_find_distance():
+    return time_per_call(lambda: find_distance((10, 20), (-30, 45)), 20000)
+
+
+def bench_cartesian_to_screen():
+    return time_per_call(lambda: cartesian_to_screen(123.4, -56.7), 20000)
+
+
+def bench_headless_main():
+    return time_per_call(lambda: run_headless(Robot(x=300, y=300, heading=0), MAIN_CMDS, record=False), 3)
+
+
+def bench_render_frame():
+    # one frame of run_simulator's drawing, onto an off screen surface
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from field_layer import FieldLayer
+    from hud import Hud
+    from vex_simulator import draw_robot, WIDTH, HEIGHT
+
+    pygame.init()
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    field = FieldLayer(WIDTH, HEIGHT)
+    hud = Hud([(5, HEIGHT - 80), (5, HEIGHT - 55), (5, HEIGHT - 30), (5, HEIGHT - 5)])
+    robot = Robot(x=0, y=0, heading=0, image_file='square_tank.jpg', image_width=50, image_height=50)
+
+    def frame():
+        robot.heading += 0.5
+        field.begin_frame(screen)
+        field.mark(draw_robot(screen, robot))
+        lines = [
+            f"cmd: {MAIN_CMDS[0]}",
+            f"heading: {int(robot.heading)}",
+            f"screen pos: {cartesian_to_screen(robot.x, robot.y)}",
+            f"field pos: ({int(robot.x)}, {int(robot.y)})",
+        ]
+        for rect in hud.draw(screen, lines):
+            field.mark(rect)
+        field.finish_frame()
+
+    return time_per_call(frame, 500)
+
+
+BENCHMARKS = {
+    "update_position": bench_update_position,
+    "angle_between_positions": bench_angle_between_positions,
+    "smallest_angle_difference": bench_smallest_angle_difference,
+    "find_distance": bench_find_distance,
+    "cartesian_to_screen": bench_cartesian_to_screen,
+    "headless_main": bench_headless_main,
+    "render_frame": bench_render_frame,
+}
+
+
+def run_benchmarks(names=None):
+    """
+    Returns {name: seconds per call}.
+    """
+    return {name: BENCHMARKS[name]() for name in (names or BENCHMARKS)}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns a list of (name, result, baseline) for every metric slower than baseline * (1 + threshold).
+    Metrics missing from the baseline are not checked.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name in baseline and seconds > baseline[name] * (1 + threshold):
+            regressions.append((name, seconds, baseline[name]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulator hot paths")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction, e.g. 0.25 for 25%%")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, default all of {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.names)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    for name, seconds in results.items():
+        line = f"{name:28s} {seconds * 1e6:12.3f} us"
+        if name in baseline:
+            line += f"  baseline {baseline[name] * 1e6:12.3f} us  ({seconds / baseline[name] - 1:+.1%})"
+        print(line)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, seconds, base in regressions:
+        print(f"REGRESSION {name}: {seconds * 1e6:.3f} us vs baseline {base * 1e6:.3f} us")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
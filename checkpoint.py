@@ -0,0 +1,145 @@
+# checkpoint.py
+# Save a HeadlessSimulation part way through and carry on later, or fork it into what-if branches.
+#
+#   sim = HeadlessSimulation(robot, prefix + tail)
+#   run_until(sim, len(prefix))                  # simulate the shared prefix once
+#   save_checkpoint(sim, "prefix.ckpt")
+#   results = run_forks(sim, [prefix + tail_a, prefix + tail_b])
+#
+# The world, planner and recorder are not saved; pass them again when restoring.
+
+import copy
+import pickle
+
+from commands import CommandExecutor
+from headless import HeadlessSimulation, DEFAULT_MAX_TIME
+from robot import Robot
+
+MAGIC = b"VEXCKPT1"
+# bump when the state layout changes
+CHECKPOINT_VERSION = 1
+
+ROBOT_FIELDS = ("x", "y", "heading", "velocity", "heading_velocity", "image_file", "image_width", "image_height",
+                "integrator")
+
+
+def executor_state(executor):
+    return {
+        "cmds": list(executor.cmds),
+        "pos_tolerance": executor.pos_tolerance,
+        "verbose": executor.verbose,
+        "cmd_index": executor.cmd_index,
+        "current_pos": executor.current_pos,
+        "target_pos": executor.target_pos,
+        # a PLANTO part way through its waypoints
+        "waypoints": executor_state(executor.waypoints) if executor.waypoints is not None else None,
+    }
+
+
+def restore_executor(state, planner=None):
+    executor = CommandExecutor(state["cmds"], pos_tolerance=state["pos_tolerance"], verbose=state["verbose"],
+                               planner=planner)
+    executor.cmd_index = state["cmd_index"]
+    executor.current_pos = state["current_pos"]
+    executor.target_pos = state["target_pos"]
+    if state["waypoints"] is not None:
+        executor.waypoints = restore_executor(state["waypoints"])
+    return executor
+
+
+def capture(sim):
+    """
+    Everything needed to continue sim, as plain data that shares nothing with sim.
+    """
+    return copy.deepcopy({
+        "version": CHECKPOINT_VERSION,
+        "robot": {name: getattr(sim.robot, name) for name in ROBOT_FIELDS},
+        "executor": executor_state(sim.executor),
+        "dt": sim.dt,
+        "record": sim.record,
+        "adaptive": sim.adaptive,
+        "sim_time": sim.sim_time,
+        "steps": sim.steps,
+        "substeps": sim.substeps,
+        "trajectory": sim.trajectory,
+        "cmd_end_times": sim.cmd_end_times,
+    })
+
+
+def restore(state, world=None, planner=None, recorder=None):
+    """
+    A new HeadlessSimulation, with its own Robot, continuing from a captured state.
+    """
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint version {state.get('version')}")
+    state = copy.deepcopy(state)
+    robot_fields = dict(state["robot"])
+    velocity = robot_fields.pop("velocity")
+    heading_velocity = robot_fields.pop("heading_velocity")
+    robot = Robot(velocity=velocity, heading_velocity=heading_velocity, **robot_fields)
+    sim = HeadlessSimulation(robot, [], dt=state["dt"], record=state["record"], adaptive=state["adaptive"],
+                             recorder=recorder, world=world, planner=planner)
+    sim.executor = restore_executor(state["executor"], planner)
+    sim.sim_time = state["sim_time"]
+    sim.steps = state["steps"]
+    sim.substeps = state["substeps"]
+    sim.trajectory = state["trajectory"]
+    sim.cmd_end_times = state["cmd_end_times"]
+    return sim
+
+
+def save_checkpoint(sim, path):
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        pickle.dump(capture(sim), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_checkpoint(path, world=None, planner=None, recorder=None):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file")
+        state = pickle.load(f)
+    return restore(state, world=world, planner=planner, recorder=recorder)
+
+
+def fork(sim, cmds=None):
+    """
+    An independent copy of sim, sharing its world and planner.
+    cmds, if given, replaces the command list. The commands that have already finished must be
+    unchanged; if the current command changes it starts over from the robot's pose.
+    """
+    state = capture(sim)
+    executor = state["executor"]
+    if cmds is not None:
+        done = executor["cmd_index"]
+        new_cmds = CommandExecutor(cmds).cmds
+        if new_cmds[:done] != executor["cmds"][:done]:
+            raise ValueError(f"a fork cannot change the {done} commands that have already finished")
+        if done < len(executor["cmds"]) and (done >= len(new_cmds) or new_cmds[done] != executor["cmds"][done]):
+            # stop and restart the current command, as the executor does between commands
+            state["robot"]["velocity"] = 0
+            state["robot"]["heading_velocity"] = 0
+            executor.update(current_pos=None, target_pos=None, waypoints=None)
+        executor["cmds"] = new_cmds
+    return restore(state, world=sim.world, planner=sim.executor.planner)
+
+
+def run_until(sim, cmd_index, max_time=DEFAULT_MAX_TIME):
+    """
+    Step sim until command cmd_index is about to start (or every command is done).
+    Returns False if max_time seconds of simulated time passed first.
+    """
+    max_steps = int(round(max_time / sim.dt))
+    while sim.executor.cmd_index < cmd_index and not sim.done:
+        if sim.steps >= max_steps:
+            return False
+        sim.step()
+    return True
+
+
+def run_forks(sim, variants, max_time=DEFAULT_MAX_TIME):
+    """
+    Fork sim once per command list in variants and run each fork to the end.
+    Returns a SimResult per variant, each including the shared part already simulated.
+    """
+    return [fork(sim, cmds).run(max_time=max_time) for cmds in variants]
@@ -0,0 +1,187 @@
+# collision.py
+# Collision detection between robots, walls and field elements.
+#
+# Every body is an oriented rectangle. A uniform grid finds the pairs that might touch
+# (broad phase), then a separating axis test checks them exactly (narrow phase) and gives
+# the direction and depth needed to push them apart.
+
+import math
+from collections import defaultdict, namedtuple
+
+DEFAULT_CELL_SIZE = 100  # field units, about two robot widths
+WALL_THICKNESS = 50
+
+
+class OrientedRect:
+    """
+    Rectangle centred on (x, y), width along heading (degrees, 0 is east), height across it.
+    """
+
+    def __init__(self, x, y, width, height, heading=0):
+        self.x = x
+        self.y = y
+        self.half_width = width / 2
+        self.half_height = height / 2
+        heading_rad = math.radians(heading)
+        self.axis_x = (math.cos(heading_rad), math.sin(heading_rad))
+        self.axis_y = (-math.sin(heading_rad), math.cos(heading_rad))
+
+    def corners(self):
+        (ux, uy), (vx, vy) = self.axis_x, self.axis_y
+        hw, hh = self.half_width, self.half_height
+        return [
+            (self.x + sx * hw * ux + sy * hh * vx, self.y + sx * hw * uy + sy * hh * vy)
+            for sx, sy in ((1, 1), (-1, 1), (-1, -1), (1, -1))
+        ]
+
+    def bounds(self):
+        """
+        Axis aligned bounding box (min_x, min_y, max_x, max_y).
+        """
+        ux, uy = self.axis_x
+        extent_x = self.half_width * abs(ux) + self.half_height * abs(uy)
+        extent_y = self.half_width * abs(uy) + self.half_height * abs(ux)
+        return self.x - extent_x, self.y - extent_y, self.x + extent_x, self.y + extent_y
+
+    def radius_along(self, axis):
+        # half the length of this rect's shadow on axis
+        ax, ay = axis
+        return (self.half_width * abs(self.axis_x[0] * ax + self.axis_x[1] * ay)
+                + self.half_height * abs(self.axis_y[0] * ax + self.axis_y[1] * ay))
+
+
+def robot_footprint(robot):
+    return OrientedRect(robot.x, robot.y, robot.image_width, robot.image_height, robot.heading)
+
+
+def separation(a, b):
+    """
+    Separating axis test for two OrientedRects.
+    Returns None if they do not overlap, otherwise (normal, depth): moving b by normal * depth separates them.
+    """
+    dx = b.x - a.x
+    dy = b.y - a.y
+    best_depth = float("inf")
+    best_normal = None
+    for axis in (a.axis_x, a.axis_y, b.axis_x, b.axis_y):
+        distance = dx * axis[0] + dy * axis[1]
+        depth = a.radius_along(axis) + b.radius_along(axis) - abs(distance)
+        if depth <= 0:
+            return None
+        if depth < best_depth:
+            sign = 1 if distance >= 0 else -1
+            best_depth = depth
+            best_normal = (axis[0] * sign, axis[1] * sign)
+    return best_normal, best_depth
+
+
+# a is always a robot index; b is a robot index, or the static Body that was hit
+Contact = namedtuple("Contact", "a b normal depth")
+Body = namedtuple("Body", "rect name")
+
+
+class UniformGrid:
+    """
+    Buckets of body ids by the grid cells their bounding boxes cover.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def cells_for(self, rect):
+        min_x, min_y, max_x, max_y = rect.bounds()
+        size = self.cell_size
+        for ix in range(math.floor(min_x / size), math.floor(max_x / size) + 1):
+            for iy in range(math.floor(min_y / size), math.floor(max_y / size) + 1):
+                yield ix, iy
+
+    def insert(self, body_id, rect):
+        for cell in self.cells_for(rect):
+            self.cells[cell].append(body_id)
+
+
+class CollisionWorld:
+    """
+    Static field geometry plus collision checks against any number of robots.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.static_bodies = []
+        self.static_grid = UniformGrid(cell_size)
+
+    @classmethod
+    def field(cls, width=800, height=800, wall_thickness=WALL_THICKNESS, cell_size=DEFAULT_CELL_SIZE):
+        """
+        A world with walls just outside the field borders drawn by run_simulator.
+        Field coordinates have (0, 0) at the center, as in utils.cartesian_to_screen.
+        """
+        world = cls(cell_size)
+        half_w, half_h = width / 2, height / 2
+        outer_w, outer_h = width + 2 * wall_thickness, height + 2 * wall_thickness
+        world.add_static(OrientedRect(0, half_h + wall_thickness / 2, outer_w, wall_thickness), "top wall")
+        world.add_static(OrientedRect(0, -half_h - wall_thickness / 2, outer_w, wall_thickness), "bottom wall")
+        world.add_static(OrientedRect(-half_w - wall_thickness / 2, 0, wall_thickness, outer_h), "left wall")
+        world.add_static(OrientedRect(half_w + wall_thickness / 2, 0, wall_thickness, outer_h), "right wall")
+        return world
+
+    def add_static(self, rect, name=None):
+        """
+        Add a wall or field element that never moves.
+        """
+        self.static_grid.insert(len(self.static_bodies), rect)
+        self.static_bodies.append(Body(rect, name))
+
+    def candidate_pairs(self, rects):
+        """
+        Broad phase: (robot, robot) and (robot, static body) id pairs whose grid cells overlap.
+        """
+        grid = UniformGrid(self.cell_size)
+        robot_pairs = set()
+        static_pairs = set()
+        for i, rect in enumerate(rects):
+            for cell in grid.cells_for(rect):
+                others = grid.cells[cell]
+                robot_pairs.update((j, i) for j in others)
+                others.append(i)
+                static_pairs.update((i, k) for k in self.static_grid.cells.get(cell, ()))
+        return robot_pairs, static_pairs
+
+    def contacts(self, robots):
+        """
+        Every overlap between robots, and between robots and static bodies.
+        """
+        rects = [robot_footprint(robot) for robot in robots]
+        robot_pairs, static_pairs = self.candidate_pairs(rects)
+        contacts = []
+        for i, j in sorted(robot_pairs):
+            hit = separation(rects[i], rects[j])
+            if hit is not None:
+                contacts.append(Contact(i, j, *hit))
+        for i, k in sorted(static_pairs):
+            body = self.static_bodies[k]
+            hit = separation(rects[i], body.rect)
+            if hit is not None:
+                contacts.append(Contact(i, body, *hit))
+        return contacts
+
+    def resolve(self, robots):
+        """
+        Push overlapping robots apart, and out of static bodies. Returns the contacts found.
+        """
+        contacts = self.contacts(robots)
+        for contact in contacts:
+            (nx, ny), depth = contact.normal, contact.depth
+            a = robots[contact.a]
+            if isinstance(contact.b, Body):
+                # walls do not move, the robot takes the whole correction
+                a.x -= nx * depth
+                a.y -= ny * depth
+            else:
+                b = robots[contact.b]
+                a.x -= nx * depth / 2
+                a.y -= ny * depth / 2
+                b.x += nx * depth / 2
+                b.y += ny * depth / 2
+        return contacts
@@ -0,0 +1,313 @@
+# commands.py
+# Command constants and the command state machine for vexSimulator.
+# Nothing in here touches pygame so it can be shared by the window and headless runs.
+
+from collections import namedtuple
+from numbers import Real
+
+from utils import angle_between_positions, smallest_angle_difference
+from utils import add_distance, find_distance
+from utils import CCW, FORWARD, REVERSE
+
+# COMMANDS
+DRIVE = "DRIVE"
+TURN = "TURN"
+RIGHT = "RIGHT"
+LEFT = "LEFT"
+GOTO = "GOTO"
+SPINTO = "SPINTO"
+PLANTO = "PLANTO"
+
+POS_TOLERANCE = 2  # units
+HEADING_TOLERANCE = 2  # degrees, used by TURN
+AIM_TOLERANCE = 1.0  # degrees, used by GOTO and SPINTO
+
+# the routine vex_simulator.main() runs, and the default for the command line tools
+MAIN_CMDS = (
+    (DRIVE, FORWARD, 20, 10),  # drive forward 20 units at 10 units/sec
+    (DRIVE, REVERSE, 20, 10),  # and back again
+    (TURN, RIGHT, 90, 20),  # turn right 90 degrees at 20 deg/sec
+    (SPINTO, 350, 250, 20),  # face (350, 250)
+    (GOTO, 100, 100, 10),  # go to (100, 100) at 10 units/sec
+)
+
+
+def check_number(cmd_info, name, value):
+    if isinstance(value, bool) or not isinstance(value, Real):
+        raise ValueError(f"{name} must be a number in {tuple(cmd_info)}")
+
+
+# Compiled commands. They are still tuples, so (DRIVE, FORWARD, 20, 10) == Drive(DRIVE, FORWARD, 20, 10),
+# but they are validated once and carry values the executor would otherwise work out every frame.
+
+class Drive(namedtuple("Drive", "cmd direction distance velocity")):
+
+    def __new__(cls, cmd, direction, distance, velocity):
+        self = super().__new__(cls, cmd, direction, distance, velocity)
+        if direction not in (FORWARD, REVERSE):
+            raise ValueError(f"DRIVE direction must be {FORWARD} or {REVERSE} in {tuple(self)}")
+        check_number(self, "distance", distance)
+        check_number(self, "velocity", velocity)
+        self.dir_sign = 1 if direction == FORWARD else -1
+        return self
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class Turn(namedtuple("Turn", "cmd direction distance velocity")):
+
+    def __new__(cls, cmd, direction, distance, velocity):
+        self = super().__new__(cls, cmd, direction, distance, velocity)
+        if direction not in (LEFT, RIGHT):
+            raise ValueError(f"TURN direction must be {LEFT} or {RIGHT} in {tuple(self)}")
+        check_number(self, "distance", distance)
+        check_number(self, "velocity", velocity)
+        # signed change in heading and heading velocity
+        self.heading_change = distance if direction == LEFT else -distance
+        self.heading_velocity = velocity if direction == LEFT else -velocity
+        return self
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class GoTo(namedtuple("GoTo", "cmd target_x target_y velocity")):
+
+    def __new__(cls, cmd, target_x, target_y, velocity):
+        self = super().__new__(cls, cmd, target_x, target_y, velocity)
+        check_number(self, "target_x", target_x)
+        check_number(self, "target_y", target_y)
+        check_number(self, "velocity", velocity)
+        self.target = (target_x, target_y)
+        return self
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class SpinTo(GoTo):
+    pass
+
+
+class PlanTo(GoTo):
+    pass
+
+
+COMMAND_TYPES = {
+    DRIVE: Drive,
+    TURN: Turn,
+    GOTO: GoTo,
+    SPINTO: SpinTo,
+    PLANTO: PlanTo,
+}
+
+
+def compile_command(cmd_info):
+    """
+    Validate a command tuple and return it as one of the command types above.
+    """
+    if type(cmd_info) in COMMAND_TYPES.values():
+        return cmd_info
+    if not cmd_info or cmd_info[0] not in COMMAND_TYPES:
+        raise ValueError(f"unknown command {cmd_info}")
+    command_type = COMMAND_TYPES[cmd_info[0]]
+    if len(cmd_info) != len(command_type._fields):
+        raise ValueError(f"{cmd_info[0]} takes {len(command_type._fields) - 1} arguments: {tuple(cmd_info)}")
+    return command_type(*cmd_info)
+
+
+def compile_commands(cmds):
+    return [compile_command(cmd_info) for cmd_info in cmds]
+
+
+class CommandExecutor:
+    """
+    Steps a robot through a list of command tuples, e.g. (DRIVE, FORWARD, 20, 10).
+    Each call to step() sets the robot's velocities for the current command and
+    moves on to the next command once the current one has been reached.
+    The commands are compiled (and so validated) when the executor is created.
+
+    PLANTO asks planner (a planner.Planner) for waypoints when the command starts
+    and runs them as SPINTO and GOTO commands. Without a planner it heads straight for the target.
+    """
+
+    def __init__(self, cmds, pos_tolerance=POS_TOLERANCE, verbose=False, planner=None):
+        self.cmds = compile_commands(cmds)
+        self.handlers = {
+            DRIVE: self.step_drive,
+            TURN: self.step_turn,
+            GOTO: self.step_goto,
+            SPINTO: self.step_spinto,
+            PLANTO: self.step_planto,
+        }
+        self.pos_tolerance = pos_tolerance
+        self.verbose = verbose
+        self.planner = planner
+        self.check_targets(self.cmds)
+        self.cmd_index = 0
+        self.current_pos = None
+        self.target_pos = None
+        # executor for the waypoints of the current PLANTO
+        self.waypoints = None
+
+    @property
+    def current_cmd_info(self):
+        return self.cmds[self.cmd_index] if self.cmd_index < len(self.cmds) else None
+
+    @property
+    def done(self):
+        return self.cmd_index >= len(self.cmds)
+
+    def next_command(self, robot):
+        # Stop the robot and move to next command
+        robot.velocity = 0
+        robot.heading_velocity = 0
+        self.cmd_index += 1
+        self.current_pos = None
+        self.target_pos = None
+        self.waypoints = None
+
+    def check_targets(self, cmds):
+        # a PLANTO into an obstacle is a mistake in the routine, reject it before the robot sets off
+        if self.planner is not None:
+            for cmd_info in cmds:
+                if cmd_info.cmd == PLANTO:
+                    self.planner.check_target(cmd_info.target)
+
+    def restart_at(self, robot, cmd_index):
+        """
+        Stop the robot and make cmd_index the next command to run, from the robot's current pose.
+        """
+        robot.velocity = 0
+        robot.heading_velocity = 0
+        self.cmd_index = cmd_index
+        self.current_pos = None
+        self.target_pos = None
+        self.waypoints = None
+
+    def remaining(self, robot):
+        """
+        How far the robot still has to move before the current command's completion
+        check passes: (distance in units, turn in degrees).
+        Either is None when the current command does not check it.
+        """
+        current_cmd_info = self.current_cmd_info
+        if self.waypoints is not None:
+            return self.waypoints.remaining(robot)
+        if not current_cmd_info or self.target_pos is None:
+            return None, None
+        current_cmd = current_cmd_info[0]
+        if current_cmd == TURN:
+            return None, max(abs(robot.heading - self.target_pos) - HEADING_TOLERANCE, 0)
+
+        distance = max(find_distance((robot.x, robot.y), self.target_pos) - self.pos_tolerance, 0)
+        if current_cmd == DRIVE:
+            return distance, None
+        angle_to_target = angle_between_positions((robot.x, robot.y), self.target_pos)
+        angle_diff, direction = smallest_angle_difference(angle_to_target, robot.heading)
+        angle = max(angle_diff - AIM_TOLERANCE, 0)
+        if current_cmd == GOTO:
+            return distance, angle
+        return None, angle
+
+    def step(self, robot):
+        """
+        Process the current command for this frame.
+        Returns the command tuple that was processed, or None when all commands are done.
+        """
+        current_cmd_info = self.current_cmd_info
+        if not current_cmd_info:
+            return None
+        self.handlers[current_cmd_info.cmd](robot, current_cmd_info)
+        return current_cmd_info
+
+    def step_drive(self, robot, current_cmd_info):
+        # get command details
+        current_cmd, direction, distance, velocity = current_cmd_info
+        if self.current_pos is None:
+            self.current_pos = robot.x, robot.y
+            self.target_pos = add_distance(self.current_pos, direction, distance, robot)
+
+        robot.velocity = velocity * current_cmd_info.dir_sign
+        robot.heading_velocity = 0
+        # are we there yet?
+        dist_to_target = find_distance((robot.x, robot.y), self.target_pos)
+        if dist_to_target <= self.pos_tolerance:
+            self.next_command(robot)
+
+    def step_turn(self, robot, current_cmd_info):
+        if self.current_pos is None:
+            self.current_pos = robot.heading
+            self.target_pos = self.current_pos + current_cmd_info.heading_change
+            robot.velocity = 0
+            robot.heading_velocity = current_cmd_info.heading_velocity
+
+        # are we there yet?
+        heading_diff = abs(robot.heading - self.target_pos)
+        if heading_diff <= HEADING_TOLERANCE:
+            self.next_command(robot)
+
+    def step_goto(self, robot, current_cmd_info):
+        velocity = current_cmd_info.velocity
+        self.current_pos = (robot.x, robot.y)
+        self.target_pos = current_cmd_info.target
+        # determine how to turn
+        angle_to_target = angle_between_positions((robot.x, robot.y), self.target_pos)
+        angle_diff, direction = smallest_angle_difference(angle_to_target, robot.heading)
+        if abs(angle_diff) < AIM_TOLERANCE:
+            # stop turning
+            robot.heading_velocity = 0
+        else:
+            if direction == CCW:
+                robot.heading_velocity = velocity
+            else:
+                robot.heading_velocity = -velocity
+
+        # drive forward towards target
+        robot.velocity = velocity
+
+        # are we there yet?
+        dist_to_target = find_distance((robot.x, robot.y), self.target_pos)
+        if dist_to_target <= self.pos_tolerance:
+            self.next_command(robot)
+
+    def step_spinto(self, robot, current_cmd_info):
+        first_time = self.current_pos is None
+        velocity = current_cmd_info.velocity
+        self.current_pos = (robot.x, robot.y)
+        self.target_pos = current_cmd_info.target
+
+        # determine how to turn
+        angle_to_target = angle_between_positions((robot.x, robot.y), self.target_pos)
+        robot.velocity = 0
+        angle_diff, direction = smallest_angle_difference(angle_to_target, robot.heading)
+        if first_time and self.verbose:
+            print(f"robot pos={self.current_pos} target_pos={self.target_pos}  ")
+            print( "angle_to_target=", angle_to_target, " robot.heading=", robot.heading, " angle_diff=", angle_diff)
+        if abs(angle_diff) < AIM_TOLERANCE:
+            robot.heading_velocity = 0
+            # go to next command
+            self.next_command(robot)
+        else:
+            if first_time and self.verbose:
+                print(" direction=", direction)
+            if direction == CCW:
+                robot.heading_velocity = velocity
+            else:
+                robot.heading_velocity = -velocity
+
+    def step_planto(self, robot, current_cmd_info):
+        if self.waypoints is None:
+            x, y, velocity = current_cmd_info.target_x, current_cmd_info.target_y, current_cmd_info.velocity
+            if self.planner is None:
+                waypoint_cmds = [SpinTo(SPINTO, x, y, velocity), GoTo(GOTO, x, y, velocity)]
+            else:
+                waypoint_cmds = self.planner.waypoint_commands((robot.x, robot.y), (x, y), velocity)
+            if self.verbose:
+                print(f"PLANTO {current_cmd_info.target}: {len(waypoint_cmds) // 2} waypoints")
+            self.waypoints = CommandExecutor(waypoint_cmds, pos_tolerance=self.pos_tolerance)
+
+        self.waypoints.step(robot)
+        if self.waypoints.done:
+            self.next_command(robot)
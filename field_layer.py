@@ -0,0 +1,66 @@
+# field_layer.py
+# The static field is drawn once into a background surface; each frame only the
+# regions that were drawn on are restored and pushed to the display.
+
+import pygame
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+
+def draw_field(surface, width, height):
+    surface.fill(WHITE)
+
+    # Draw border lines
+    pygame.draw.line(surface, BLACK, (0, 0), (width, 0), 3)           # Top
+    pygame.draw.line(surface, BLACK, (0, 0), (0, height), 3)          # Left
+    pygame.draw.line(surface, BLACK, (0, height-1), (width, height-1), 3)  # Bottom
+    pygame.draw.line(surface, BLACK, (width-1, 0), (width-1, height), 3)   # Right
+
+    # Draw center vertical and horizontal lines
+    pygame.draw.line(surface, BLACK, (width // 2, 0), (width // 2, height), 2)  # Vertical center
+    pygame.draw.line(surface, BLACK, (0, height // 2), (width, height // 2), 2)  # Horizontal center
+
+
+class FieldLayer:
+    """
+    Cached field background plus dirty rectangle tracking.
+    Per frame: begin_frame(screen), draw things and mark() their rects, then end_frame().
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.background = pygame.Surface((width, height))
+        draw_field(self.background, width, height)
+        self.prev_rects = None  # None until the whole screen has been drawn once
+        self.rects = []
+
+    def begin_frame(self, screen):
+        # erase last frame's drawing by copying the background back over it
+        if self.prev_rects is None:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.prev_rects:
+                screen.blit(self.background, rect, rect)
+        self.rects = []
+
+    def mark(self, rect):
+        # record a region drawn this frame, returns it for convenience
+        if rect is not None and rect.width and rect.height:
+            self.rects.append(rect)
+        return rect
+
+    def finish_frame(self):
+        """
+        Return the regions that changed since the last frame, what was erased plus what was drawn.
+        """
+        if self.prev_rects is None:
+            dirty = [pygame.Rect(0, 0, self.width, self.height)]
+        else:
+            dirty = self.prev_rects + self.rects
+        self.prev_rects = self.rects
+        return dirty
+
+    def end_frame(self):
+        pygame.display.update(self.finish_frame())
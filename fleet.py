@@ -0,0 +1,223 @@
+# fleet.py
+# Struct-of-arrays robots: advance thousands of robots per step with NumPy.
+
+import numpy as np
+
+from robot import Robot
+from commands import DRIVE, TURN, GOTO, SPINTO, FORWARD, REVERSE, LEFT, RIGHT
+from commands import POS_TOLERANCE, HEADING_TOLERANCE, AIM_TOLERANCE
+from headless import DEFAULT_DT, DEFAULT_MAX_TIME
+
+# integer codes for the command types, NO_CMD pads the shorter command lists
+NO_CMD = -1
+CMD_CODES = {DRIVE: 0, TURN: 1, GOTO: 2, SPINTO: 3}
+DRIVE_CODE, TURN_CODE, GOTO_CODE, SPINTO_CODE = (CMD_CODES[c] for c in (DRIVE, TURN, GOTO, SPINTO))
+
+# sign applied to distance / velocity for each direction word
+DIRECTION_SIGNS = {
+    DRIVE: {FORWARD: 1.0, REVERSE: -1.0},
+    TURN: {LEFT: 1.0, RIGHT: -1.0},
+}
+
+
+class RobotFleet:
+    """
+    N robots stored as parallel NumPy arrays, with the same units and
+    conventions as Robot: cartesian x, y, heading in degrees (0 is east),
+    velocity in units per second, heading_velocity in degrees per second.
+    """
+
+    def __init__(self, n, x=0, y=0, heading=0, velocity=0, heading_velocity=0):
+        self.x = self._column(n, x)
+        self.y = self._column(n, y)
+        self.heading = self._column(n, heading)
+        self.velocity = self._column(n, velocity)
+        self.heading_velocity = self._column(n, heading_velocity)
+
+    @staticmethod
+    def _column(n, value):
+        # broadcast scalars, copy arrays so the fleet owns its state
+        return np.array(np.broadcast_to(np.asarray(value, dtype=np.float64), (n,)))
+
+    @classmethod
+    def from_robots(cls, robots):
+        return cls(
+            len(robots),
+            x=[r.x for r in robots],
+            y=[r.y for r in robots],
+            heading=[r.heading for r in robots],
+            velocity=[r.velocity for r in robots],
+            heading_velocity=[r.heading_velocity for r in robots],
+        )
+
+    def to_robots(self):
+        return [
+            Robot(x=float(x), y=float(y), heading=float(h), velocity=float(v), heading_velocity=float(hv))
+            for x, y, h, v, hv in zip(self.x, self.y, self.heading, self.velocity, self.heading_velocity)
+        ]
+
+    def __len__(self):
+        return len(self.x)
+
+    def update_position(self, dt):
+        # Same forward Euler step as Robot.update_position, for every robot at once
+        heading_rad = np.radians(self.heading)
+        self.x += self.velocity * dt * np.cos(heading_rad)
+        self.y += self.velocity * dt * np.sin(heading_rad)
+        self.heading += self.heading_velocity * dt
+
+
+def encode_commands(cmds_per_robot):
+    """
+    Pack one command list per robot into padded arrays.
+    Returns (codes, arg1, arg2, velocity, lengths); for DRIVE and TURN arg1 is the
+    direction sign and arg2 the distance, for GOTO and SPINTO they are the target x and y.
+    """
+    n = len(cmds_per_robot)
+    width = max((len(cmds) for cmds in cmds_per_robot), default=0)
+    codes = np.full((n, max(width, 1)), NO_CMD, dtype=np.int8)
+    arg1 = np.zeros(codes.shape)
+    arg2 = np.zeros(codes.shape)
+    velocity = np.zeros(codes.shape)
+    lengths = np.zeros(n, dtype=np.int64)
+    for i, cmds in enumerate(cmds_per_robot):
+        lengths[i] = len(cmds)
+        for j, cmd_info in enumerate(cmds):
+            cmd = cmd_info[0]
+            if cmd not in CMD_CODES:
+                raise ValueError(f"unknown command {cmd_info}")
+            codes[i, j] = CMD_CODES[cmd]
+            if cmd in (DRIVE, TURN):
+                _, direction, distance, vel = cmd_info
+                if direction not in DIRECTION_SIGNS[cmd]:
+                    raise ValueError(f"unknown direction in {cmd_info}")
+                arg1[i, j] = DIRECTION_SIGNS[cmd][direction]
+                arg2[i, j] = distance
+            else:
+                _, target_x, target_y, vel = cmd_info
+                arg1[i, j] = target_x
+                arg2[i, j] = target_y
+            velocity[i, j] = vel
+    return codes, arg1, arg2, velocity, lengths
+
+
+class FleetExecutor:
+    """
+    Batched version of CommandExecutor: every robot runs its own command list,
+    and each step handles all robots on the same command type with array operations.
+    """
+
+    def __init__(self, n, cmds, pos_tolerance=POS_TOLERANCE):
+        # a single command list is shared by every robot
+        if cmds and isinstance(cmds[0], tuple) and isinstance(cmds[0][0], str):
+            cmds = [cmds] * n
+        if len(cmds) != n:
+            raise ValueError(f"expected {n} command lists, got {len(cmds)}")
+        self.codes, self.arg1, self.arg2, self.cmd_velocity, self.lengths = encode_commands(cmds)
+        self.pos_tolerance = pos_tolerance
+        self.cmd_index = np.zeros(n, dtype=np.int64)
+        self.started = np.zeros(n, dtype=bool)
+        self.target_x = np.zeros(n)
+        self.target_y = np.zeros(n)
+        self.target_heading = np.zeros(n)
+
+    @property
+    def active(self):
+        return self.cmd_index < self.lengths
+
+    @property
+    def done(self):
+        return not self.active.any()
+
+    def current(self, values):
+        # value of the current command for every robot, padding for finished robots
+        col = np.minimum(self.cmd_index, values.shape[1] - 1)
+        return values[np.arange(len(col)), col]
+
+    def next_command(self, fleet, mask):
+        fleet.velocity[mask] = 0
+        fleet.heading_velocity[mask] = 0
+        self.cmd_index[mask] += 1
+        self.started[mask] = False
+
+    def step(self, fleet):
+        codes = np.where(self.active, self.current(self.codes), NO_CMD)
+        arg1 = self.current(self.arg1)
+        arg2 = self.current(self.arg2)
+        velocity = self.current(self.cmd_velocity)
+        finished = np.zeros(len(codes), dtype=bool)
+
+        # DRIVE: fix the target on the first step, then drive straight at it
+        drive = codes == DRIVE_CODE
+        if drive.any():
+            start = drive & ~self.started
+            heading_rad = np.radians(fleet.heading[start])
+            self.target_x[start] = fleet.x[start] + arg1[start] * arg2[start] * np.cos(heading_rad)
+            self.target_y[start] = fleet.y[start] + arg1[start] * arg2[start] * np.sin(heading_rad)
+            self.started |= start
+            fleet.velocity[drive] = velocity[drive] * arg1[drive]
+            fleet.heading_velocity[drive] = 0
+            dist = np.hypot(self.target_x[drive] - fleet.x[drive], self.target_y[drive] - fleet.y[drive])
+            finished[drive] = dist <= self.pos_tolerance
+
+        # TURN: fix the target heading and spin rate on the first step
+        turn = codes == TURN_CODE
+        if turn.any():
+            start = turn & ~self.started
+            self.target_heading[start] = fleet.heading[start] + arg1[start] * arg2[start]
+            fleet.velocity[start] = 0
+            fleet.heading_velocity[start] = arg1[start] * velocity[start]
+            self.started |= start
+            finished[turn] = np.abs(fleet.heading[turn] - self.target_heading[turn]) <= HEADING_TOLERANCE
+
+        # GOTO and SPINTO both aim at a point every step
+        aim = (codes == GOTO_CODE) | (codes == SPINTO_CODE)
+        if aim.any():
+            angle_to_target = np.degrees(np.arctan2(arg2[aim] - fleet.y[aim], arg1[aim] - fleet.x[aim]))
+            diff = np.mod(angle_to_target - fleet.heading[aim], 360)
+            ccw = diff <= 180
+            angle_diff = np.where(ccw, diff, 360 - diff)
+            aimed = angle_diff < AIM_TOLERANCE
+            fleet.heading_velocity[aim] = np.where(aimed, 0, np.where(ccw, velocity[aim], -velocity[aim]))
+
+            goto = codes[aim] == GOTO_CODE
+            fleet.velocity[aim] = np.where(goto, velocity[aim], 0)
+            dist = np.hypot(arg1[aim] - fleet.x[aim], arg2[aim] - fleet.y[aim])
+            finished[aim] = np.where(goto, dist <= self.pos_tolerance, aimed)
+
+        if finished.any():
+            self.next_command(fleet, finished)
+
+
+class FleetResult:
+    """
+    Outcome of a fleet run. completion_time is NaN for robots that did not finish.
+    """
+
+    def __init__(self, fleet, executor, sim_time, steps, completion_time):
+        self.fleet = fleet
+        self.completed = ~executor.active
+        self.cmd_index = executor.cmd_index
+        self.sim_time = sim_time
+        self.steps = steps
+        self.completion_time = completion_time
+
+
+def run_fleet(fleet, cmds, dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME, pos_tolerance=POS_TOLERANCE):
+    """
+    Run cmds (one list shared by all robots, or one list per robot) on every robot in fleet.
+    """
+    executor = FleetExecutor(len(fleet), cmds, pos_tolerance=pos_tolerance)
+    completion_time = np.full(len(fleet), np.nan)
+    completion_time[~executor.active] = 0.0
+    max_steps = int(round(max_time / dt))
+    sim_time = 0.0
+    steps = 0
+    while not executor.done and steps < max_steps:
+        executor.step(fleet)
+        fleet.update_position(dt)
+        sim_time += dt
+        steps += 1
+        newly_done = ~executor.active & np.isnan(completion_time)
+        completion_time[newly_done] = sim_time
+    return FleetResult(fleet, executor, sim_time, steps, completion_time)
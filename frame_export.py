@@ -0,0 +1,160 @@
+# frame_export.py
+# Record simulator frames to disk without a window, for batch review videos on headless servers.
+#
+# The main loop copies each finished frame into a bytes buffer and queues it; background threads
+# encode and write the buffers, so the simulation only ever waits on disk when the queue is full
+# and the policy is BLOCK.
+#
+#   with FrameExporter("frames", fmt=PNG) as exporter:
+#       run_simulator(robot, cmds, exporter=exporter)
+#
+# A RAW export is one file of packed RGB frames, e.g. for ffmpeg:
+#   ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x800 -r 60 -i frames.rgb out.mp4
+
+import argparse
+import os
+import queue
+import threading
+
+import pygame
+
+PNG = "png"
+RAW = "raw"
+FORMATS = (PNG, RAW)
+
+BLOCK = "block"  # wait for room in the queue, every frame is written
+DROP = "drop"  # skip frames that arrive while the queue is full, the simulation never waits
+POLICIES = (BLOCK, DROP)
+
+DEFAULT_FPS = 60
+DEFAULT_QUEUE_SIZE = 64  # frames, about 120 MB of 800x800 RGB
+DEFAULT_WORKERS = 4
+
+
+class FrameExporter:
+    """
+    Writes frames passed to submit() from a pool of background threads.
+    PNG writes path/frame_000000.png and so on, RAW writes every frame to the single file path,
+    in order, so it always uses one thread.
+    """
+
+    def __init__(self, path, fmt=PNG, fps=DEFAULT_FPS, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 policy=BLOCK):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown frame format {fmt}")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy {policy}")
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.frames = 0  # frames queued, the number of the next frame
+        self.written = 0  # updated by the writer threads, under lock
+        self.dropped = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.raw_file = None
+        if fmt == RAW:
+            workers = 1
+            self.raw_file = open(path, "wb")
+        else:
+            os.makedirs(path, exist_ok=True)
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def frame_path(self, index):
+        return os.path.join(self.path, f"frame_{index:06d}.png")
+
+    def submit(self, surface):
+        """
+        Queue a copy of surface as the next frame. Returns False if the frame was dropped.
+        """
+        self.check_error()
+        # only frames that are queued take a number, so dropped frames leave no gaps in
+        # the PNG sequence. Playback is then faster than real time, by the share dropped.
+        item = (self.frames, surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+        if self.policy == BLOCK:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        self.frames += 1
+        return True
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            index, size, data = item
+            try:
+                if self.fmt == RAW:
+                    self.raw_file.write(data)
+                else:
+                    pygame.image.save(pygame.image.frombytes(data, size, "RGB"), self.frame_path(index))
+                with self.lock:
+                    self.written += 1
+            except Exception as e:
+                # reported to the main thread by the next submit() or close()
+                self.error = e
+
+    def check_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"frame export to {self.path} failed") from self.error
+
+    def close(self):
+        """
+        Wait for every queued frame to be written.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.raw_file is not None:
+            self.raw_file.close()
+            self.raw_file = None
+        self.check_error()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an autonomous routine to image files without a window")
+    parser.add_argument("routine", help="routine file to render")
+    parser.add_argument("out", help="directory for PNG frames, or the file for a raw RGB stream")
+    parser.add_argument("--format", choices=FORMATS, default=PNG)
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--policy", choices=POLICIES, default=BLOCK)
+    parser.add_argument("--max-time", type=float, default=None, help="seconds of simulated time to render")
+    args = parser.parse_args()
+
+    # no window is opened, but pygame still needs a video driver for fonts and images
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from vex_simulator import run_simulator, WIDTH, HEIGHT
+    from robot import Robot
+    from collision import CollisionWorld
+    from routine import load_routine
+
+    cmds = load_routine(args.routine)
+    robot = Robot(x=300, y=300, heading=0, image_file="square_tank.jpg", image_width=50, image_height=50)
+    with FrameExporter(args.out, fmt=args.format, fps=args.fps, workers=args.workers, queue_size=args.queue_size,
+                       policy=args.policy) as exporter:
+        run_simulator(robot, cmds, world=CollisionWorld.field(WIDTH, HEIGHT), exporter=exporter,
+                      max_time=args.max_time)
+    print(f"Wrote {exporter.written} frames to {args.out}, dropped {exporter.dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# headless.py
+# Run command lists without pygame, using a fixed time step instead of the wall clock.
+
+from commands import CommandExecutor, POS_TOLERANCE
+
+DEFAULT_DT = 1.0 / 60.0  # seconds, same rate as the pygame window
+DEFAULT_MAX_TIME = 120.0  # seconds of simulated time before giving up
+MAX_TURN_PER_SUBSTEP = 5.0  # degrees, bounds the error of coupled turning and driving
+MAX_SUBSTEPS = 1000  # per step, so a stalled command cannot stall the run
+SUBSTEP_OVERSHOOT = 1e-6  # units or degrees past a completion check that a substep aims for
+
+
+class SimResult:
+    """
+    Outcome of a headless run.
+    trajectory is a list of (time, x, y, heading, cmd_index) tuples, one per step.
+    cmd_end_times holds the simulated time at which each finished command ended.
+    """
+
+    def __init__(self, robot, completed, sim_time, steps, trajectory, cmd_end_times, substeps=None):
+        self.x = robot.x
+        self.y = robot.y
+        self.heading = robot.heading
+        self.completed = completed
+        self.sim_time = sim_time
+        self.steps = steps
+        # robot updates, more than steps when substepping
+        self.substeps = steps if substeps is None else substeps
+        self.trajectory = trajectory
+        self.cmd_end_times = cmd_end_times
+
+    @property
+    def cmd_durations(self):
+        durations = []
+        start = 0.0
+        for end in self.cmd_end_times:
+            durations.append(end - start)
+            start = end
+        return durations
+
+    @property
+    def final_pose(self):
+        return self.x, self.y, self.heading
+
+
+class HeadlessSimulation:
+    """
+    Fixed time step simulation of a robot running a command list.
+    Uses the same CommandExecutor and Robot.update_position as the pygame window.
+
+    With adaptive=True each step is split into substeps, re-running the command
+    logic before each one, so that the robot never moves past the current target
+    or turns more than MAX_TURN_PER_SUBSTEP degrees at once. Far from any target
+    a substep is the whole step, which allows much larger dt.
+    """
+
+    def __init__(self, robot, cmds, dt=DEFAULT_DT, pos_tolerance=POS_TOLERANCE, record=True, adaptive=False,
+                 recorder=None, world=None, planner=None):
+        self.robot = robot
+        # planner is an optional planner.Planner for PLANTO commands
+        self.executor = CommandExecutor(cmds, pos_tolerance=pos_tolerance, planner=planner)
+        self.dt = dt
+        self.record = record
+        self.adaptive = adaptive
+        # optional trajectory_log.TrajectoryWriter
+        self.recorder = recorder
+        # optional collision.CollisionWorld, the robot is pushed out of anything it hits
+        self.world = world
+        self.sim_time = 0.0
+        self.steps = 0
+        self.substeps = 0
+        self.trajectory = []
+        self.cmd_end_times = []
+
+    @property
+    def done(self):
+        return self.executor.done
+
+    def substep_dt(self, time_left):
+        # largest substep that cannot jump over the current command's completion check
+        robot = self.robot
+        distance, angle = self.executor.remaining(robot)
+        h = time_left
+        if distance is not None and robot.velocity:
+            h = min(h, (distance + SUBSTEP_OVERSHOOT) / abs(robot.velocity))
+        if robot.heading_velocity:
+            max_turn = MAX_TURN_PER_SUBSTEP if angle is None else min(angle + SUBSTEP_OVERSHOOT, MAX_TURN_PER_SUBSTEP)
+            h = min(h, max_turn / abs(robot.heading_velocity))
+        return max(h, self.dt / MAX_SUBSTEPS)
+
+    def move(self, dt):
+        self.robot.update_position(dt)
+        if self.world is not None:
+            self.world.resolve([self.robot])
+
+    def mark_cmd_ends(self, time):
+        while len(self.cmd_end_times) < self.executor.cmd_index:
+            self.cmd_end_times.append(time)
+
+    def step(self):
+        if self.adaptive:
+            time_left = self.dt
+            while time_left > 1e-12:
+                cmd_index = self.executor.cmd_index
+                self.executor.step(self.robot)
+                # commands finish as soon as the executor sees it, not at the end of the step
+                self.mark_cmd_ends(self.sim_time + self.dt - time_left)
+                if self.executor.done:
+                    break
+                if self.executor.cmd_index != cmd_index:
+                    # start the next command right away
+                    continue
+                h = min(self.substep_dt(time_left), time_left)
+                self.move(h)
+                time_left -= h
+                self.substeps += 1
+            self.sim_time += self.dt - time_left
+        else:
+            self.executor.step(self.robot)
+            self.move(self.dt)
+            self.substeps += 1
+            self.sim_time += self.dt
+            self.mark_cmd_ends(self.sim_time)
+        self.steps += 1
+        if self.record:
+            robot = self.robot
+            self.trajectory.append((self.sim_time, robot.x, robot.y, robot.heading, self.executor.cmd_index))
+        if self.recorder is not None:
+            self.recorder.append_robot(self.sim_time, self.robot, self.executor.cmd_index)
+
+    def run(self, max_time=DEFAULT_MAX_TIME):
+        """
+        Step until every command has finished or max_time seconds of simulated time have passed.
+        """
+        max_steps = int(round(max_time / self.dt))
+        while not self.done and self.steps < max_steps:
+            self.step()
+        return SimResult(self.robot, self.done, self.sim_time, self.steps, self.trajectory, self.cmd_end_times,
+                         substeps=self.substeps)
+
+
+def run_headless(robot, cmds, dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME, pos_tolerance=POS_TOLERANCE, record=True,
+                 adaptive=False, recorder=None, world=None, planner=None):
+    """
+    Run cmds on robot without a display and return a SimResult.
+    """
+    sim = HeadlessSimulation(robot, cmds, dt=dt, pos_tolerance=pos_tolerance, record=record, adaptive=adaptive,
+                             recorder=recorder, world=world, planner=planner)
+    return sim.run(max_time=max_time)
@@ -0,0 +1,199 @@
+# hot_reload.py
+# Reload a routine file while the simulator runs, picking up from the first command that changed.
+#
+#   run_simulator(robot, [], routine_file="auton.txt")         # window, reloads on save
+#
+#   run = ReloadableRun(Robot(x=300, y=300), load_routine("auton.txt"))
+#   run.run()
+#   result = run.reload(load_routine("auton.txt"))             # headless, only re-runs the changed tail
+#
+# The window keeps the robot's pose at the start of every command. When an edit changes a command
+# that has already started, the robot jumps back to where that command started (or to the start
+# pose with rewind=START) and carries on with the new commands. Edits further down the list take
+# effect when the robot gets there.
+
+import os
+
+from checkpoint import capture, restore, fork
+from commands import compile_commands
+from headless import HeadlessSimulation, DEFAULT_MAX_TIME
+from routine import parse_routine
+
+START = "start"  # rewind to the start pose and run every command again
+CACHED = "cached"  # rewind to the start of the first changed command
+REWIND_MODES = (START, CACHED)
+
+DEFAULT_POLL_INTERVAL = 0.25  # seconds between checks of the file
+
+
+def first_changed(old_cmds, new_cmds):
+    """
+    Index of the first command that differs between the two lists, None if they are the same.
+    """
+    for i, (old, new) in enumerate(zip(old_cmds, new_cmds)):
+        if old != new:
+            return i
+    if len(old_cmds) != len(new_cmds):
+        return min(len(old_cmds), len(new_cmds))
+    return None
+
+
+def running(executor):
+    """
+    True once the current command has started: the executor has stepped it at least once.
+    A PLANTO only shows this through its waypoint executor.
+    """
+    return executor.current_pos is not None or executor.waypoints is not None
+
+
+class RoutineWatcher:
+    """
+    Polls a routine file and returns its commands when its contents change.
+    """
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.stat = None
+        self.text = None
+        self.last_check = None
+        # message for the last edit that did not parse, None once it is fixed
+        self.error = None
+
+    def load(self):
+        """
+        Read the file now, returns its commands. Parse errors raise ValueError.
+        """
+        self.stat = self.file_stat()
+        with open(self.path, encoding="utf-8") as f:
+            self.text = f.read()
+        return parse_routine(self.text, source=self.path)
+
+    def file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check(self, now):
+        """
+        The new commands if the file changed since the last check, otherwise None.
+        now is the current time in seconds, checks closer together than poll_interval are skipped.
+        """
+        if self.last_check is not None and now - self.last_check < self.poll_interval:
+            return None
+        self.last_check = now
+        stat = self.file_stat()
+        if stat is None or stat == self.stat:
+            return None
+        self.stat = stat
+        with open(self.path, encoding="utf-8") as f:
+            text = f.read()
+        if text == self.text:
+            return None
+        self.text = text
+        try:
+            cmds = parse_routine(text, source=self.path)
+        except ValueError as e:
+            # keep running the old commands until the file is fixed
+            self.error = str(e)
+            return None
+        self.error = None
+        return cmds
+
+
+class StartPoses:
+    """
+    Robot pose at the start of each command, recorded as a RobotTask runs.
+    Between commands the robot is stopped, so the pose is all the state a command starts from.
+    """
+
+    def __init__(self):
+        self.poses = {}
+
+    def record(self, task):
+        executor = task.executor
+        if executor.cmd_index not in self.poses and not running(executor) and not executor.done:
+            robot = task.robot
+            self.poses[executor.cmd_index] = (robot.x, robot.y, robot.heading)
+
+    def forget_from(self, cmd_index):
+        for i in [i for i in self.poses if i > cmd_index]:
+            del self.poses[i]
+
+
+def reload_task(task, new_cmds, start_poses, rewind=CACHED):
+    """
+    Swap new_cmds into a running scheduler.RobotTask, raises ValueError (changing nothing) for a blocked PLANTO target.
+    Returns the index of the command the robot restarted from, or None if it did not need to rewind.
+    """
+    if rewind not in REWIND_MODES:
+        raise ValueError(f"unknown rewind mode {rewind}")
+    executor = task.executor
+    new_cmds = compile_commands(new_cmds)
+    executor.check_targets(new_cmds)
+    changed = first_changed(executor.cmds, new_cmds)
+    if changed is None:
+        return None
+    started = executor.cmd_index if running(executor) else executor.cmd_index - 1
+    if rewind == START:
+        restart = 0
+    elif changed <= started:
+        restart = changed
+    else:
+        # nothing that has run changed, the robot just carries on
+        was_done = task.done
+        executor.cmds = new_cmds
+        if was_done:
+            task.restart()
+        return None
+
+    robot = task.robot
+    robot.x, robot.y, robot.heading = start_poses.poses[restart]
+    start_poses.forget_from(restart)
+    executor.cmds = new_cmds
+    executor.restart_at(robot, restart)
+    del task.cmd_end_times[restart:]
+    task.restart()
+    return restart
+
+
+class ReloadableRun:
+    """
+    Headless run that keeps a checkpoint at the start of every command,
+    so a reload only simulates the commands from the first change onwards.
+    """
+
+    def __init__(self, robot, cmds, max_time=DEFAULT_MAX_TIME, **kwargs):
+        self.sim = HeadlessSimulation(robot, cmds, **kwargs)
+        self.max_time = max_time
+        self.checkpoints = {}
+        # command the last run or reload started simulating from
+        self.resumed_from = 0
+
+    def run(self):
+        sim = self.sim
+        max_steps = int(round(self.max_time / sim.dt))
+        while True:
+            executor = sim.executor
+            if not running(executor) and executor.cmd_index not in self.checkpoints:
+                self.checkpoints[executor.cmd_index] = capture(sim)
+            if sim.done or sim.steps >= max_steps:
+                break
+            sim.step()
+        return sim.run(max_time=self.max_time)
+
+    def reload(self, new_cmds):
+        new_cmds = compile_commands(new_cmds)
+        changed = first_changed(self.sim.executor.cmds, new_cmds)
+        if changed is None:
+            return self.sim.run(max_time=self.max_time)
+        # latest checkpoint at or before the change
+        restart = max(i for i in self.checkpoints if i <= changed)
+        for i in [i for i in self.checkpoints if i > restart]:
+            del self.checkpoints[i]
+        resumed = restore(self.checkpoints[restart], world=self.sim.world, planner=self.sim.executor.planner)
+        self.sim = fork(resumed, new_cmds)
+        self.resumed_from = restart
+        return self.run()
@@ -0,0 +1,75 @@
+# hud.py
+# Heads up display text: fonts are created once and rendered lines are cached.
+
+from collections import OrderedDict
+
+import pygame
+
+from field_layer import BLACK
+
+FONT_SIZE = 24
+DEFAULT_MAX_ENTRIES = 256  # rendered strings kept before evicting the least recently used
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed on (text, color).
+    """
+
+    def __init__(self, font, max_entries=DEFAULT_MAX_ENTRIES):
+        self.font = font
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, text, color=BLACK):
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+class Hud:
+    """
+    Fixed lines of text, each drawn with its bottom left corner at a screen position.
+    A line is only looked up again when its text changes.
+    """
+
+    def __init__(self, positions, font_size=FONT_SIZE, max_entries=DEFAULT_MAX_ENTRIES, font=None):
+        if font is None:
+            font = pygame.font.SysFont(None, font_size)
+        self.positions = positions
+        self.text_cache = TextCache(font, max_entries=max_entries)
+        self.texts = [None] * len(positions)
+        self.surfaces = [None] * len(positions)
+
+    def draw(self, screen, lines):
+        """
+        Draw lines (one string, or None to leave it blank, per position).
+        Returns the rects drawn on.
+        """
+        rects = []
+        for i, text in enumerate(lines):
+            if text is None:
+                continue
+            if text != self.texts[i]:
+                self.texts[i] = text
+                self.surfaces[i] = self.text_cache.render(text)
+            surface = self.surfaces[i]
+            rect = surface.get_rect()
+            rect.bottomleft = self.positions[i]
+            rects.append(screen.blit(surface, rect))
+        return rects
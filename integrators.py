@@ -0,0 +1,46 @@
+# integrators.py
+# Ways to advance a pose (x, y, heading in degrees) by dt with constant
+# velocity (units/sec) and heading_velocity (degrees/sec).
+
+import math
+
+EULER = "EULER"  # move along the old heading, then turn (the original update)
+ARC = "ARC"      # exact constant curvature arc
+RK4 = "RK4"      # classic Runge-Kutta, 4th order
+
+
+def euler_step(x, y, heading, velocity, heading_velocity, dt):
+    x += velocity * dt * math.cos(math.radians(heading))
+    y += velocity * dt * math.sin(math.radians(heading))
+    heading += heading_velocity * dt
+    return x, y, heading
+
+
+def arc_step(x, y, heading, velocity, heading_velocity, dt):
+    turn = heading_velocity * dt
+    if abs(turn) < 1e-9:
+        # straight line, the arc formula divides by the turn rate
+        return euler_step(x, y, heading, velocity, 0, dt)
+    h0 = math.radians(heading)
+    h1 = math.radians(heading + turn)
+    radius = velocity / math.radians(heading_velocity)
+    x += radius * (math.sin(h1) - math.sin(h0))
+    y -= radius * (math.cos(h1) - math.cos(h0))
+    return x, y, heading + turn
+
+
+def rk4_step(x, y, heading, velocity, heading_velocity, dt):
+    # heading changes linearly, so only the position terms need evaluating
+    h0 = math.radians(heading)
+    h_mid = math.radians(heading + heading_velocity * dt / 2)
+    h1 = math.radians(heading + heading_velocity * dt)
+    x += velocity * dt / 6 * (math.cos(h0) + 4 * math.cos(h_mid) + math.cos(h1))
+    y += velocity * dt / 6 * (math.sin(h0) + 4 * math.sin(h_mid) + math.sin(h1))
+    return x, y, heading + heading_velocity * dt
+
+
+INTEGRATORS = {
+    EULER: euler_step,
+    ARC: arc_step,
+    RK4: rk4_step,
+}
@@ -0,0 +1,198 @@
+# montecarlo.py
+# How repeatable is a routine? Run it thousands of times with noisy motion, in NumPy batches,
+# and look at where the robot ends up and how often each command gets within its tolerance.
+#
+#   noise = NoiseModel(velocity_scale_sd=0.03, heading_drift_sd=1.0, start_xy_sd=1.0)
+#   result = run_monte_carlo(cmds, trials=5000, start=(300, 300, 0), noise=noise)
+#   print(result.summary())
+
+import argparse
+
+import numpy as np
+
+from commands import POS_TOLERANCE, MAIN_CMDS
+from fleet import RobotFleet, run_fleet
+from headless import DEFAULT_DT, DEFAULT_MAX_TIME
+from routine import load_routine
+
+DEFAULT_BATCH_SIZE = 1000
+PERCENTILES = (50, 90, 99)
+
+
+class NoiseModel:
+    """
+    Standard deviations of the noise added to each trial.
+    velocity_scale_sd and heading_scale_sd are per trial scale errors on the commanded drive
+    and turn rates (0.02 is 2%). heading_drift_sd (degrees per sqrt second) and odometry_sd
+    (units per sqrt second, along the direction of travel) are random walks added while moving.
+    start_xy_sd (units) and start_heading_sd (degrees) jitter the start pose.
+    """
+
+    def __init__(self, velocity_scale_sd=0.0, heading_scale_sd=0.0, heading_drift_sd=0.0, odometry_sd=0.0,
+                 start_xy_sd=0.0, start_heading_sd=0.0):
+        self.velocity_scale_sd = velocity_scale_sd
+        self.heading_scale_sd = heading_scale_sd
+        self.heading_drift_sd = heading_drift_sd
+        self.odometry_sd = odometry_sd
+        self.start_xy_sd = start_xy_sd
+        self.start_heading_sd = start_heading_sd
+
+
+class NoisyFleet(RobotFleet):
+    """
+    RobotFleet whose motion differs from what the executor commands, one noise draw per robot.
+    The executor still sets velocity and heading_velocity as usual, the noise is only applied
+    to the motion in update_position.
+    """
+
+    def __init__(self, n, x, y, heading, noise, rng):
+        super().__init__(
+            n,
+            x=x + rng.normal(0, noise.start_xy_sd, n),
+            y=y + rng.normal(0, noise.start_xy_sd, n),
+            heading=heading + rng.normal(0, noise.start_heading_sd, n),
+        )
+        self.noise = noise
+        self.rng = rng
+        self.velocity_scale = 1 + rng.normal(0, noise.velocity_scale_sd, n)
+        self.heading_scale = 1 + rng.normal(0, noise.heading_scale_sd, n)
+
+    def update_position(self, dt):
+        n = len(self)
+        noise = self.noise
+        moving = (self.velocity != 0) | (self.heading_velocity != 0)
+        root_dt = np.sqrt(dt)
+        distance = self.velocity * self.velocity_scale * dt
+        distance += np.where(self.velocity != 0, self.rng.normal(0, noise.odometry_sd * root_dt, n), 0)
+        turn = self.heading_velocity * self.heading_scale * dt
+        turn += np.where(moving, self.rng.normal(0, noise.heading_drift_sd * root_dt, n), 0)
+        heading_rad = np.radians(self.heading)
+        self.x += distance * np.cos(heading_rad)
+        self.y += distance * np.sin(heading_rad)
+        self.heading += turn
+
+
+def wrap_degrees(angle):
+    return (angle + 180) % 360 - 180
+
+
+class MonteCarloResult:
+    """
+    Per trial outcomes of run_monte_carlo, as arrays with one entry per trial.
+    cmds_finished[i, j] is True if trial i got command j within its tolerance before max_time.
+    Errors are measured against the nominal run, the same routine without noise.
+    """
+
+    def __init__(self, cmds, nominal, final_x, final_y, final_heading, completion_time, cmds_finished):
+        self.cmds = cmds
+        self.nominal = nominal
+        self.final_x = final_x
+        self.final_y = final_y
+        self.final_heading = final_heading
+        self.completion_time = completion_time
+        self.cmds_finished = cmds_finished
+
+    @property
+    def trials(self):
+        return len(self.final_x)
+
+    @property
+    def completed(self):
+        return self.cmds_finished.all(axis=1)
+
+    @property
+    def position_error(self):
+        x, y, _ = self.nominal
+        return np.hypot(self.final_x - x, self.final_y - y)
+
+    @property
+    def heading_error(self):
+        return wrap_degrees(self.final_heading - self.nominal[2])
+
+    @property
+    def command_success(self):
+        """
+        Probability that each command finishes within its tolerance.
+        """
+        return self.cmds_finished.mean(axis=0)
+
+    def summary(self):
+        def stats(values):
+            result = {"mean": float(np.mean(values)) if len(values) else float("nan")}
+            for p in PERCENTILES:
+                result[f"p{p}"] = float(np.percentile(values, p)) if len(values) else float("nan")
+            return result
+
+        completed = self.completed
+        return {
+            "trials": self.trials,
+            "completed": float(completed.mean()),
+            "position_error": stats(self.position_error),
+            "abs_heading_error": stats(np.abs(self.heading_error)),
+            "completion_time": stats(self.completion_time[completed]),
+            "command_success": [float(p) for p in self.command_success],
+        }
+
+
+def run_batch(cmds, n, start, noise, rng, dt, max_time, pos_tolerance):
+    x, y, heading = start
+    fleet = NoisyFleet(n, x, y, heading, noise, rng)
+    result = run_fleet(fleet, cmds, dt=dt, max_time=max_time, pos_tolerance=pos_tolerance)
+    cmds_finished = result.cmd_index[:, None] > np.arange(len(cmds))[None, :]
+    return fleet.x, fleet.y, fleet.heading, result.completion_time, cmds_finished
+
+
+def run_monte_carlo(cmds, trials, start=(0, 0, 0), noise=None, batch_size=DEFAULT_BATCH_SIZE, dt=DEFAULT_DT,
+                    max_time=DEFAULT_MAX_TIME, pos_tolerance=POS_TOLERANCE, seed=None):
+    """
+    Run cmds from start (x, y, heading) trials times with noise, batch_size trials at a time.
+    Returns a MonteCarloResult.
+    """
+    if trials < 1:
+        raise ValueError("trials must be at least 1")
+    noise = noise if noise is not None else NoiseModel()
+    rng = np.random.default_rng(seed)
+    nominal = run_batch(cmds, 1, start, NoiseModel(), rng, dt, max_time, pos_tolerance)
+    nominal_pose = tuple(float(values[0]) for values in nominal[:3])
+
+    batches = []
+    for first in range(0, trials, batch_size):
+        n = min(batch_size, trials - first)
+        batches.append(run_batch(cmds, n, start, noise, rng, dt, max_time, pos_tolerance))
+    columns = [np.concatenate([batch[i] for batch in batches]) for i in range(5)]
+    return MonteCarloResult(cmds, nominal_pose, *columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo repeatability of an autonomous routine")
+    parser.add_argument("--routine", help="routine file to run, default is the main() routine")
+    parser.add_argument("--trials", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-time", type=float, default=DEFAULT_MAX_TIME)
+    parser.add_argument("--velocity-scale-sd", type=float, default=0.02)
+    parser.add_argument("--heading-scale-sd", type=float, default=0.02)
+    parser.add_argument("--heading-drift-sd", type=float, default=0.5)
+    parser.add_argument("--odometry-sd", type=float, default=0.2)
+    parser.add_argument("--start-xy-sd", type=float, default=0.5)
+    parser.add_argument("--start-heading-sd", type=float, default=0.5)
+    args = parser.parse_args()
+
+    cmds = list(MAIN_CMDS)
+    if args.routine:
+        cmds = load_routine(args.routine)
+    noise = NoiseModel(args.velocity_scale_sd, args.heading_scale_sd, args.heading_drift_sd, args.odometry_sd,
+                       args.start_xy_sd, args.start_heading_sd)
+    result = run_monte_carlo(cmds, args.trials, start=(300, 300, 0), noise=noise, batch_size=args.batch_size,
+                             max_time=args.max_time, seed=args.seed)
+    summary = result.summary()
+    print(f"{summary['trials']} trials, {summary['completed']:.1%} completed")
+    for name in ("position_error", "abs_heading_error", "completion_time"):
+        stats = summary[name]
+        print(f"{name:18s} mean {stats['mean']:.2f}  " + "  ".join(f"p{p} {stats[f'p{p}']:.2f}" for p in PERCENTILES))
+    for cmd_info, p in zip(cmds, summary["command_success"]):
+        print(f"  {p:7.1%}  {tuple(cmd_info)}")
+
+
+if __name__ == "__main__":
+    main()
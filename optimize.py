@@ -0,0 +1,244 @@
+# optimize.py
+# Tune the free numbers of a routine for the shortest completion time with Nelder-Mead,
+# while the robot still has to end up where the routine is meant to take it.
+#
+# Free parameters use the sweep.py names ("velocity", "velocity.2", "x", ...) with (low, high) bounds:
+#
+#   result = optimize(cmds, {"velocity.0": (5, 40), "velocity.2": (5, 60)}, start=(300, 300, 0))
+#   print(result.params, result.cost)
+#
+# Candidates run headless through sweep.run_variant, each Nelder-Mead step's candidates in one
+# parallel batch, and every evaluated point is remembered so it is never simulated twice.
+
+import argparse
+import math
+import multiprocessing
+
+from commands import MAIN_CMDS
+from headless import DEFAULT_DT, DEFAULT_MAX_TIME
+from routine import load_routine
+from sweep import run_variant, POSE_PARAMS
+
+DEFAULT_MAX_ITERATIONS = 100
+DEFAULT_POS_ERROR = 2.0  # units from the target pose allowed at the end
+DEFAULT_HEADING_ERROR = 2.0  # degrees
+PENALTY = 10.0  # seconds of cost per unit or degree outside the allowed error
+MEMO_DIGITS = 9  # normalized coordinates are rounded to this many digits for the memo table
+
+# Nelder-Mead coefficients
+REFLECT, EXPAND, CONTRACT, SHRINK = 1.0, 2.0, 0.5, 0.5
+
+
+class Objective:
+    """
+    Cost of one headless run: the completion time, plus PENALTY seconds per unit and degree that the
+    final pose misses target_pose by more than the allowed error. Runs that do not finish cost
+    twice max_time plus the miss.
+    """
+
+    def __init__(self, target_pose, max_pos_error=DEFAULT_POS_ERROR, max_heading_error=DEFAULT_HEADING_ERROR,
+                 penalty=PENALTY):
+        self.target_pose = target_pose
+        self.max_pos_error = max_pos_error
+        self.max_heading_error = max_heading_error
+        self.penalty = penalty
+
+    def errors(self, row):
+        x, y, heading = self.target_pose
+        pos_error = math.hypot(row["final_x"] - x, row["final_y"] - y)
+        heading_error = abs((row["final_heading"] - heading + 180) % 360 - 180)
+        return pos_error, heading_error
+
+    def feasible(self, row):
+        pos_error, heading_error = self.errors(row)
+        return row["completed"] and pos_error <= self.max_pos_error and heading_error <= self.max_heading_error
+
+    def __call__(self, row, max_time):
+        pos_error, heading_error = self.errors(row)
+        miss = max(pos_error - self.max_pos_error, 0) + max(heading_error - self.max_heading_error, 0)
+        time = row["completion_time"] if row["completed"] else 2 * max_time
+        return time + self.penalty * miss
+
+
+class OptimizeResult:
+
+    def __init__(self, params, cost, row, feasible, iterations, evaluations, memo_hits):
+        self.params = params
+        self.cost = cost
+        # the run_variant row of the best run
+        self.row = row
+        self.feasible = feasible
+        self.iterations = iterations
+        self.evaluations = evaluations
+        self.memo_hits = memo_hits
+
+
+class Evaluator:
+    """
+    Runs batches of normalized points headless, in parallel, remembering every result.
+    """
+
+    def __init__(self, cmds, bounds, start, objective, pool, dt, max_time):
+        self.cmds = cmds
+        self.names = list(bounds)
+        self.bounds = [bounds[name] for name in self.names]
+        self.start = dict(zip(POSE_PARAMS, start))
+        self.objective = objective
+        self.pool = pool
+        self.dt = dt
+        self.max_time = max_time
+        self.memo = {}
+        self.memo_hits = 0
+
+    def params(self, point):
+        # normalized [0, 1] coordinates to parameter values
+        return {name: low + min(max(u, 0.0), 1.0) * (high - low)
+                for name, u, (low, high) in zip(self.names, point, self.bounds)}
+
+    def key(self, point):
+        return tuple(round(min(max(u, 0.0), 1.0), MEMO_DIGITS) for u in point)
+
+    def rows(self, points):
+        keys = [self.key(point) for point in points]
+        todo = list(dict.fromkeys(key for key in keys if key not in self.memo))
+        self.memo_hits += len(keys) - len(todo)
+        tasks = [(i, self.cmds, self.start, self.params(key), self.dt, self.max_time) for i, key in enumerate(todo)]
+        rows = self.pool.map(run_variant, tasks) if self.pool is not None else [run_variant(t) for t in tasks]
+        for key, row in zip(todo, rows):
+            self.memo[key] = (self.objective(row, self.max_time), row)
+        return [self.memo[key] for key in keys]
+
+    def costs(self, points):
+        return [cost for cost, row in self.rows(points)]
+
+
+def nelder_mead(evaluator, initial, step=0.1, max_iterations=DEFAULT_MAX_ITERATIONS, tolerance=1e-3):
+    """
+    Minimize over the unit cube starting at the normalized point initial.
+    Reflection, expansion and both contractions of a step are evaluated together as one batch.
+    Returns (best point, best cost, iterations).
+    """
+    n = len(initial)
+    simplex = [list(initial)]
+    for i in range(n):
+        point = list(initial)
+        # step inwards from whichever bound is closer
+        point[i] += step if point[i] + step <= 1.0 else -step
+        simplex.append(point)
+    costs = evaluator.costs(simplex)
+
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        order = sorted(range(n + 1), key=lambda i: costs[i])
+        simplex = [simplex[i] for i in order]
+        costs = [costs[i] for i in order]
+        if costs[-1] - costs[0] <= tolerance and max(abs(a - b) for p in simplex[1:] for a, b in zip(p, simplex[0])) \
+                <= tolerance:
+            break
+
+        centroid = [sum(p[i] for p in simplex[:-1]) / n for i in range(n)]
+        worst = simplex[-1]
+
+        def towards(coefficient):
+            return [c + coefficient * (c - w) for c, w in zip(centroid, worst)]
+
+        reflected, expanded = towards(REFLECT), towards(EXPAND)
+        outside, inside = towards(CONTRACT), towards(-CONTRACT)
+        reflected_cost, expanded_cost, outside_cost, inside_cost = evaluator.costs(
+            [reflected, expanded, outside, inside])
+
+        if reflected_cost < costs[0]:
+            simplex[-1], costs[-1] = (expanded, expanded_cost) if expanded_cost < reflected_cost \
+                else (reflected, reflected_cost)
+        elif reflected_cost < costs[-2]:
+            simplex[-1], costs[-1] = reflected, reflected_cost
+        elif reflected_cost < costs[-1] and outside_cost <= reflected_cost:
+            simplex[-1], costs[-1] = outside, outside_cost
+        elif inside_cost < costs[-1]:
+            simplex[-1], costs[-1] = inside, inside_cost
+        else:
+            best = simplex[0]
+            simplex = [best] + [[b + SHRINK * (a - b) for a, b in zip(p, best)] for p in simplex[1:]]
+            costs = [costs[0]] + evaluator.costs(simplex[1:])
+
+    best = min(range(n + 1), key=lambda i: costs[i])
+    return simplex[best], costs[best], iteration
+
+
+def optimize(cmds, bounds, start=(0, 0, 0), initial=None, target_pose=None, max_pos_error=DEFAULT_POS_ERROR,
+             max_heading_error=DEFAULT_HEADING_ERROR, max_iterations=DEFAULT_MAX_ITERATIONS, processes=None,
+             dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME):
+    """
+    Find values for the parameters in bounds ({name: (low, high)}) that minimize the completion time
+    of cmds from start, with the final pose within the allowed error of target_pose.
+    initial gives starting values (default the middle of each range). target_pose defaults to
+    where the routine ends with the initial values. processes=1 runs everything in this process.
+    """
+    if not bounds:
+        raise ValueError("no parameters to optimize")
+    initial = dict(initial or {})
+    point = []
+    for name, (low, high) in bounds.items():
+        if not low < high:
+            raise ValueError(f"empty range for {name}: {low}, {high}")
+        value = initial.get(name, (low + high) / 2)
+        point.append((value - low) / (high - low))
+
+    pool = multiprocessing.Pool(processes) if processes != 1 else None
+    try:
+        evaluator = Evaluator(cmds, bounds, start, None, pool, dt, max_time)
+        if target_pose is None:
+            row = run_variant((0, cmds, evaluator.start, evaluator.params(point), dt, max_time))
+            target_pose = (row["final_x"], row["final_y"], row["final_heading"])
+        evaluator.objective = Objective(target_pose, max_pos_error, max_heading_error)
+        best, cost, iterations = nelder_mead(evaluator, point, max_iterations=max_iterations)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    _, row = evaluator.memo[evaluator.key(best)]
+    return OptimizeResult(evaluator.params(best), cost, row, evaluator.objective.feasible(row), iterations,
+                          len(evaluator.memo), evaluator.memo_hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune routine parameters for the shortest completion time")
+    parser.add_argument("--routine", help="routine file to tune, default is the main() routine")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=LOW:HIGH",
+                        help="e.g. velocity=5:40 or velocity.2=10:60")
+    parser.add_argument("--max-iterations", type=int, default=DEFAULT_MAX_ITERATIONS)
+    parser.add_argument("--max-pos-error", type=float, default=DEFAULT_POS_ERROR)
+    parser.add_argument("--max-heading-error", type=float, default=DEFAULT_HEADING_ERROR)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, default is one per core")
+    args = parser.parse_args()
+
+    cmds = list(MAIN_CMDS)
+    if args.routine:
+        cmds = load_routine(args.routine)
+    bounds = {}
+    for param in args.param:
+        name, _, text = param.partition("=")
+        low, high = (float(v) for v in text.split(":"))
+        bounds[name] = (low, high)
+    if not bounds:
+        bounds = {f"velocity.{i}": (5, 60) for i in range(len(cmds))}
+    # start from the routine's own values where they are being tuned
+    initial = {}
+    for name in bounds:
+        field, _, index = name.partition(".")
+        if field == "velocity" and index:
+            initial[name] = min(max(cmds[int(index)][3], bounds[name][0]), bounds[name][1])
+
+    result = optimize(cmds, bounds, start=(300, 300, 0), initial=initial, max_pos_error=args.max_pos_error,
+                      max_heading_error=args.max_heading_error, max_iterations=args.max_iterations,
+                      processes=args.processes)
+    status = "meets" if result.feasible else "does NOT meet"
+    print(f"completion time {result.row['completion_time']:.2f}s, {status} the pose error limits")
+    print(f"{result.evaluations} runs, {result.memo_hits} repeats skipped, {result.iterations} iterations")
+    for name, value in result.params.items():
+        print(f"  {name} = {value:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# planner.py
+# Path planning around field obstacles for the PLANTO command.
+#
+# The field is split into square cells, and a cell is blocked if a robot centred in it could touch
+# a static body of a collision.CollisionWorld. The first plan to a target is a single A* search.
+# A target asked for again runs Dijkstra outward from it, which gives the cost to reach it from
+# every cell. This distance field is cached, so every later plan to that target, from any start,
+# just walks downhill.
+#
+#   planner = Planner(CollisionWorld.field(800, 800))
+#   run_headless(robot, [(PLANTO, 300, -200, 20)], world=planner.world, planner=planner)
+
+import heapq
+import math
+from collections import OrderedDict
+
+from collision import OrientedRect, separation
+from commands import SPINTO, GOTO, SpinTo, GoTo
+
+DEFAULT_RESOLUTION = 10  # field units per grid cell
+DEFAULT_CLEARANCE = 36  # half the diagonal of a 50 unit robot, so any heading fits
+DEFAULT_CACHE_SIZE = 64  # distance fields kept, one per target cell
+
+SQRT2 = math.sqrt(2)
+# (d_col, d_row, cost) for the 8 neighbours of a cell
+NEIGHBOURS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2)]
+
+
+class OccupancyGrid:
+    """
+    Grid of free and blocked cells covering width x height field units centred on (0, 0).
+    """
+
+    def __init__(self, width=800, height=800, resolution=DEFAULT_RESOLUTION):
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.cols = int(math.ceil(width / resolution))
+        self.rows = int(math.ceil(height / resolution))
+        self.blocked = [[False] * self.cols for _ in range(self.rows)]
+
+    @classmethod
+    def from_world(cls, world, width=800, height=800, resolution=DEFAULT_RESOLUTION, clearance=DEFAULT_CLEARANCE):
+        """
+        Block every cell whose centre is within clearance of one of the world's static bodies.
+        """
+        grid = cls(width, height, resolution)
+        for row in range(grid.rows):
+            for col in range(grid.cols):
+                x, y = grid.cell_center((col, row))
+                # the cell grown by clearance on every side
+                rect = OrientedRect(x, y, resolution + 2 * clearance, resolution + 2 * clearance)
+                bodies = {k for cell in world.static_grid.cells_for(rect) for k in world.static_grid.cells.get(cell, ())}
+                grid.blocked[row][col] = any(separation(rect, world.static_bodies[k].rect) for k in bodies)
+        return grid
+
+    def cell_at(self, pos):
+        x, y = pos
+        col = int(math.floor((x + self.width / 2) / self.resolution))
+        row = int(math.floor((y + self.height / 2) / self.resolution))
+        return min(max(col, 0), self.cols - 1), min(max(row, 0), self.rows - 1)
+
+    def cell_center(self, cell):
+        col, row = cell
+        return (-self.width / 2 + (col + 0.5) * self.resolution,
+                -self.height / 2 + (row + 0.5) * self.resolution)
+
+    def is_free(self, cell):
+        col, row = cell
+        return 0 <= col < self.cols and 0 <= row < self.rows and not self.blocked[row][col]
+
+    def neighbours(self, cell):
+        # diagonal moves may not cut the corner of a blocked cell
+        col, row = cell
+        for d_col, d_row, cost in NEIGHBOURS:
+            neighbour = col + d_col, row + d_row
+            if not self.is_free(neighbour):
+                continue
+            if d_col and d_row and not (self.is_free((col + d_col, row)) and self.is_free((col, row + d_row))):
+                continue
+            yield neighbour, cost
+
+    def nearest_free(self, cell):
+        """
+        The free cell closest to cell, for robots that start inside an obstacle's clearance.
+        """
+        if self.is_free(cell):
+            return cell
+        col, row = cell
+        for radius in range(1, max(self.cols, self.rows)):
+            ring = [(col + dc, row + dr) for dc in range(-radius, radius + 1) for dr in range(-radius, radius + 1)
+                    if max(abs(dc), abs(dr)) == radius]
+            free = [c for c in ring if self.is_free(c)]
+            if free:
+                return min(free, key=lambda c: math.hypot(c[0] - col, c[1] - row))
+        return None
+
+    def line_of_sight(self, a, b):
+        """
+        True if the straight segment between the centres of cells a and b only crosses free cells.
+        """
+        (x1, y1), (x2, y2) = self.cell_center(a), self.cell_center(b)
+        samples = int(math.ceil(2 * math.hypot(x2 - x1, y2 - y1) / self.resolution))
+        for i in range(samples + 1):
+            t = i / samples if samples else 0
+            if not self.is_free(self.cell_at((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))):
+                return False
+        return True
+
+
+def octile_distance(a, b):
+    d_col, d_row = abs(a[0] - b[0]), abs(a[1] - b[1])
+    return max(d_col, d_row) + (SQRT2 - 1) * min(d_col, d_row)
+
+
+def astar(grid, start, goal):
+    """
+    A* from cell start to cell goal. Returns (cost in cells, list of cells) or None if goal cannot be reached.
+    """
+    open_heap = [(octile_distance(start, goal), 0.0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0.0}
+    while open_heap:
+        _, cost, cell = heapq.heappop(open_heap)
+        if cell == goal:
+            path = []
+            while cell is not None:
+                path.append(cell)
+                cell = came_from[cell]
+            return cost, path[::-1]
+        if cost > cost_so_far[cell]:
+            continue
+        for neighbour, step_cost in grid.neighbours(cell):
+            new_cost = cost + step_cost
+            if new_cost < cost_so_far.get(neighbour, math.inf):
+                cost_so_far[neighbour] = new_cost
+                came_from[neighbour] = cell
+                heapq.heappush(open_heap, (new_cost + octile_distance(neighbour, goal), new_cost, neighbour))
+    return None
+
+
+def distance_field(grid, goal):
+    """
+    Dijkstra outward from goal: {cell: cost in cells to reach goal} for every cell that can reach it.
+    """
+    costs = {goal: 0.0}
+    heap = [(0.0, goal)]
+    while heap:
+        cost, cell = heapq.heappop(heap)
+        if cost > costs[cell]:
+            continue
+        for neighbour, step_cost in grid.neighbours(cell):
+            new_cost = cost + step_cost
+            if new_cost < costs.get(neighbour, math.inf):
+                costs[neighbour] = new_cost
+                heapq.heappush(heap, (new_cost, neighbour))
+    return costs
+
+
+def descend(grid, costs, start):
+    """
+    Follow a distance field downhill from start. Returns the cells to the goal, or None if start cannot reach it.
+    """
+    if start not in costs:
+        return None
+    path = [start]
+    cell = start
+    while costs[cell] > 0:
+        _, cell = min((costs[n] + step_cost, n) for n, step_cost in grid.neighbours(cell) if n in costs)
+        path.append(cell)
+    return path
+
+
+def smooth_path(grid, path):
+    """
+    Drop every cell that can be skipped in a straight line, keeping the first and last.
+    """
+    if len(path) <= 2:
+        return list(path)
+    smoothed = [path[0]]
+    i = 0
+    while i < len(path) - 1:
+        # furthest cell still in sight of path[i]
+        j = len(path) - 1
+        while j > i + 1 and not grid.line_of_sight(path[i], path[j]):
+            j -= 1
+        smoothed.append(path[j])
+        i = j
+    return smoothed
+
+
+class Planner:
+    """
+    Plans PLANTO commands on an OccupancyGrid built from a CollisionWorld.
+    One-off targets are searched with A*, repeated ones get a distance field.
+    Distance fields are cached per target cell, least recently used dropped first.
+    """
+
+    def __init__(self, world, width=800, height=800, resolution=DEFAULT_RESOLUTION, clearance=DEFAULT_CLEARANCE,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        self.world = world
+        self.grid = OccupancyGrid.from_world(world, width, height, resolution, clearance)
+        self.cache_size = cache_size
+        self.fields = OrderedDict()
+        # target cells planned to once with A*, a second plan builds their distance field
+        self.searched = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.searches = 0
+
+    def path_to(self, goal, start):
+        # cells from start to goal, None if there is no way through
+        if goal in self.fields or goal in self.searched:
+            self.searched.pop(goal, None)
+            return descend(self.grid, self.field_for(goal), start)
+        self.searches += 1
+        self.searched[goal] = True
+        if len(self.searched) > self.cache_size:
+            self.searched.popitem(last=False)
+        found = astar(self.grid, start, goal)
+        return found[1] if found is not None else None
+
+    def field_for(self, goal):
+        costs = self.fields.get(goal)
+        if costs is not None:
+            self.hits += 1
+            self.fields.move_to_end(goal)
+            return costs
+        self.misses += 1
+        costs = distance_field(self.grid, goal)
+        self.fields[goal] = costs
+        if len(self.fields) > self.cache_size:
+            self.fields.popitem(last=False)
+        return costs
+
+    def check_target(self, target):
+        # only the target is known before the robot gets there, reachability depends on the start
+        if not self.grid.is_free(self.grid.cell_at(target)):
+            raise ValueError(f"PLANTO target {tuple(target)} is inside an obstacle")
+
+    def plan(self, start, target):
+        """
+        Waypoints (x, y) from start to target around the static bodies, ending exactly at target.
+        Raises ValueError if there is no way through.
+        """
+        grid = self.grid
+        goal = grid.cell_at(target)
+        self.check_target(target)
+        start_cell = grid.nearest_free(grid.cell_at(start))
+        path = self.path_to(goal, start_cell) if start_cell is not None else None
+        if path is None:
+            raise ValueError(f"no path from {tuple(start)} to {tuple(target)}")
+        cells = smooth_path(grid, path)
+        # a robot starting too close to an obstacle first backs out to the nearest free cell
+        first = 0 if start_cell != grid.cell_at(start) else 1
+        waypoints = [grid.cell_center(cell) for cell in cells[first:-1]]
+        return waypoints + [tuple(target)]
+
+    def waypoint_commands(self, start, target, velocity):
+        """
+        The plan as commands the executor already knows: for each waypoint
+        a SPINTO to face it, then a GOTO to drive there.
+        """
+        cmds = []
+        for x, y in self.plan(start, target):
+            cmds.append(SpinTo(SPINTO, x, y, velocity))
+            cmds.append(GoTo(GOTO, x, y, velocity))
+        return cmds
@@ -0,0 +1,119 @@
+# profiler.py
+# Per-phase timing of the run_simulator main loop.
+#
+#   profiler = FrameProfiler()
+#   profiler.add_hook(lambda frame, timings: ...)   # called after every frame
+#   run_simulator(robot, cmds, profiler=profiler)
+#   profiler.export_json("profile.json")
+
+import csv
+import json
+import time
+from collections import deque
+
+PHASES = ("events", "commands", "update_position", "field", "draw_robot", "hud", "display")
+PERCENTILES = (50, 90, 99)
+DEFAULT_WINDOW = 300  # frames kept for the rolling percentiles
+
+
+def percentile(sorted_values, p):
+    # nearest rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round(p / 100 * (len(sorted_values) - 1)))]
+
+
+class FrameProfiler:
+    """
+    Call begin_frame() at the top of the loop, lap(phase) at the end of each phase
+    and end_frame() at the bottom. Times are in seconds.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, phases=PHASES):
+        self.phases = phases
+        self.window = window
+        self.samples = {phase: deque(maxlen=window) for phase in phases + ("frame",)}
+        self.hooks = []
+        self.frame = 0
+        self.timings = {}
+        self.frame_start = 0.0
+        self.last = 0.0
+
+    def add_hook(self, callback):
+        """
+        callback(frame_number, timings) is called at the end of every frame,
+        timings maps each phase (and "frame") to seconds.
+        """
+        self.hooks.append(callback)
+
+    def begin_frame(self):
+        self.timings = {}
+        self.frame_start = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        for phase in self.phases:
+            self.timings.setdefault(phase, 0.0)
+        self.timings["frame"] = self.last - self.frame_start
+        for phase, seconds in self.timings.items():
+            self.samples[phase].append(seconds)
+        for hook in self.hooks:
+            hook(self.frame, self.timings)
+        self.frame += 1
+
+    def summary(self):
+        """
+        {phase: {"mean": s, "p50": s, "p90": s, "p99": s}} over the rolling window.
+        """
+        result = {}
+        for phase, samples in self.samples.items():
+            values = sorted(samples)
+            stats = {"mean": sum(values) / len(values) if values else 0.0}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = percentile(values, p)
+            result[phase] = stats
+        return result
+
+    def to_json(self):
+        return json.dumps({"frames": self.frame, "window": self.window, "phases": self.summary()}, indent=2)
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    def export_csv(self, path):
+        """
+        One row per frame in the rolling window, one column per phase.
+        """
+        columns = list(self.samples)
+        rows = zip(*(self.samples[phase] for phase in columns))
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+    def overlay_lines(self):
+        summary = self.summary()
+        lines = [f"{'phase':16s} p50 / p99 ms"]
+        for phase, stats in summary.items():
+            lines.append(f"{phase:16s} {stats['p50'] * 1000:.2f} / {stats['p99'] * 1000:.2f}")
+        return lines
+
+
+class NullProfiler:
+    """
+    Stands in for a FrameProfiler when profiling is off.
+    """
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
@@ -0,0 +1,102 @@
+# replay.py
+# Play back a trajectory log written by run_simulator(log_file=...) or HeadlessSimulation(recorder=...).
+#
+# Keys: SPACE pause, LEFT/RIGHT seek 5 seconds, PAGE UP/PAGE DOWN previous/next command,
+# UP/DOWN double/halve the speed, HOME restart.
+
+import argparse
+
+import pygame
+
+from robot import Robot
+from trajectory_log import TrajectoryLog
+from field_layer import FieldLayer
+from hud import Hud
+from vex_simulator import draw_robot, WIDTH, HEIGHT
+
+SEEK_SECONDS = 5.0
+
+
+def replay(log_file, image_file='square_tank.jpg', image_width=50, image_height=50, speed=1.0):
+    log = TrajectoryLog(log_file)
+    if not len(log):
+        print(f"{log_file} has no frames")
+        return
+    command_starts = log.command_starts()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f'VEX Robot Simulator replay: {log_file}')
+    field = FieldLayer(WIDTH, HEIGHT)
+    hud = Hud([(5, HEIGHT - 55), (5, HEIGHT - 30), (5, HEIGHT - 5)])
+    clock = pygame.time.Clock()
+    robot = Robot(image_file=image_file, image_width=image_width, image_height=image_height)
+
+    play_time = float(log[0]["time"])
+    index = 0
+    paused = False
+    running = True
+    while running:
+        dt = clock.tick(60) / 1000.0
+        seek_to = None
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    seek_to = play_time + SEEK_SECONDS
+                elif event.key == pygame.K_LEFT:
+                    seek_to = play_time - SEEK_SECONDS
+                elif event.key == pygame.K_HOME:
+                    seek_to = 0.0
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+                elif event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN) and len(command_starts):
+                    times = command_starts["time"]
+                    if event.key == pygame.K_PAGEDOWN:
+                        later = times[times > play_time]
+                        seek_to = later[0] if len(later) else log.duration
+                    else:
+                        earlier = times[times < play_time - 0.5]
+                        seek_to = earlier[-1] if len(earlier) else 0.0
+
+        if seek_to is not None:
+            play_time = min(max(float(seek_to), 0.0), log.duration)
+            index = min(log.seek(play_time), len(log) - 1)
+        elif not paused:
+            # stream forward to the last frame at or before play_time
+            play_time = min(play_time + dt * speed, log.duration)
+            while index + 1 < len(log) and log[index + 1]["time"] <= play_time:
+                index += 1
+
+        frame = log[index]
+        robot.x, robot.y, robot.heading = float(frame["x"]), float(frame["y"]), float(frame["heading"])
+
+        field.begin_frame(screen)
+        field.mark(draw_robot(screen, robot))
+        lines = [
+            f"time: {frame['time']:.2f}s / {log.duration:.2f}s  speed: {speed:g}x{'  paused' if paused else ''}",
+            f"cmd: {int(frame['cmd_index'])}  heading: {int(robot.heading)}",
+            f"field pos: ({int(robot.x)}, {int(robot.y)})",
+        ]
+        for rect in hud.draw(screen, lines):
+            field.mark(rect)
+        field.end_frame()
+
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a vexSimulator trajectory log")
+    parser.add_argument("log_file")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+    replay(args.log_file, speed=args.speed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-
-import pygame
-import math
+import assets
+from integrators import INTEGRATORS, EULER
 
 class Robot:
-    def __init__(self, x=0, y=0, heading=0, velocity=0, heading_velocity=0, image_file=None, image_width=0, image_height=0):
+    def __init__(self, x=0, y=0, heading=0, velocity=0, heading_velocity=0, image_file=None, image_width=0, image_height=0,
+                 integrator=EULER):
         # cartesian coordinates
         self.x = x
         self.y = y
@@ -16,18 +16,29 @@ class Robot:
         self.image_file = image_file
         self.image_width = image_width
         self.image_height = image_height
-        self.init_image()
+        # one of integrators.EULER, ARC or RK4
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"unknown integrator {integrator}")
+        self.integrator = integrator
+        # the image is loaded the first time it is drawn, so headless robots never need pygame
+        self._robot_img = None
 
     def init_image(self):
-        # Load and scale the robot's image
-        robot_img = pygame.image.load(self.image_file)
-        self.robot_img = pygame.transform.scale(robot_img, (self.image_width, self.image_height))
-        self.robot_rect = self.robot_img.get_rect()
-        self.robot_rect.center = (self.x, self.y)
+        # Load and scale the robot's image, shared with every robot using the same file and size
+        self._robot_img = assets.load_image(self.image_file, (self.image_width, self.image_height))
+
+    @property
+    def robot_img(self):
+        if self._robot_img is None:
+            self.init_image()
+        return self._robot_img
+
+    @property
+    def robot_rect(self):
+        return self.robot_img.get_rect(center=(self.x, self.y))
 
     def update_position(self, dt):
         # Update the robot's position based on its velocity and heading
-        self.x += self.velocity * dt * math.cos(math.radians(self.heading))
-        self.y += self.velocity * dt * math.sin(math.radians(self.heading))
+        step = INTEGRATORS[self.integrator]
+        self.x, self.y, self.heading = step(self.x, self.y, self.heading, self.velocity, self.heading_velocity, dt)
         # self.robot_rect.center = (self.x, self.y)
-        self.heading += self.heading_velocity * dt
\ No newline at end of file
@@ -0,0 +1,93 @@
+# routine.py
+# Routine files: one command per line, written like the command tuples without the punctuation.
+#
+#   # drive out and back, then head for the corner
+#   DRIVE FORWARD 20 10
+#   DRIVE REVERSE 20 10
+#   TURN RIGHT 90 20
+#   SPINTO 350 250 20
+#   GOTO 100 100 10
+#
+# load_routine() validates and compiles a file once and caches the compiled
+# commands on disk, keyed by a hash of the file contents.
+
+import hashlib
+import os
+import pickle
+
+from commands import compile_command
+
+CACHE_DIR = ".routine_cache"
+# bump when the compiled format changes so old cache files are ignored
+CACHE_VERSION = 1
+
+
+def parse_number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_routine(text, source="<routine>"):
+    """
+    Parse and compile routine text. Errors name the source and line.
+    """
+    cmds = []
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        words = line.split()
+        cmd = words[0].upper()
+        try:
+            # words that are not numbers are direction keywords
+            args = []
+            for word in words[1:]:
+                try:
+                    args.append(parse_number(word))
+                except ValueError:
+                    args.append(word.upper())
+            cmds.append(compile_command((cmd, *args)))
+        except ValueError as e:
+            raise ValueError(f"{source}:{lineno}: {e}") from None
+    return cmds
+
+
+def format_routine(cmds):
+    """
+    Routine text for a command list, the inverse of parse_routine.
+    """
+    return "".join(" ".join(str(value) for value in cmd_info) + "\n" for cmd_info in cmds)
+
+
+def cache_path(data, cache_dir=CACHE_DIR):
+    digest = hashlib.sha256(data + f"v{CACHE_VERSION}".encode()).hexdigest()
+    return os.path.join(cache_dir, digest + ".pickle")
+
+
+def load_routine(path, cache_dir=CACHE_DIR):
+    """
+    Load a routine file, using the compiled copy in cache_dir if the contents have been seen before.
+    Pass cache_dir=None to skip the cache.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if cache_dir is None:
+        return parse_routine(data.decode("utf-8"), source=path)
+
+    cached = cache_path(data, cache_dir)
+    try:
+        with open(cached, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    cmds = parse_routine(data.decode("utf-8"), source=path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write then rename, so parallel sweep workers never read a half written file
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(cmds, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cached)
+    return cmds
@@ -0,0 +1,145 @@
+# scheduler.py
+# Several robots, each with its own command list, advanced together in one simulation.
+#
+# Each robot's commands run in a generator (command_loop) that the Scheduler resumes once per
+# step, so every robot keeps its own executor state and the main loop keeps none.
+#
+#   scheduler = Scheduler(world=CollisionWorld.field(800, 800))
+#   scheduler.add(Robot(x=300, y=300), cmds, name="red 1")
+#   scheduler.add(Robot(x=-300, y=-300), other_cmds, name="blue 1")
+#   results = scheduler.run()
+
+from commands import CommandExecutor, POS_TOLERANCE, compile_commands
+from headless import SimResult, DEFAULT_DT, DEFAULT_MAX_TIME
+
+
+def command_loop(robot, executor, on_start=None):
+    """
+    Generator that runs executor on robot, one executor step per next().
+    Yields the command processed by that step and returns when every command is done.
+    on_start(cmd_index, cmd_info) is called as each command starts.
+    """
+    started = None
+    while not executor.done:
+        if on_start is not None and executor.cmd_index != started:
+            started = executor.cmd_index
+            on_start(started, executor.current_cmd_info)
+        yield executor.step(robot)
+
+
+class RobotTask:
+    """
+    One robot, its executor and the generator running it.
+    """
+
+    def __init__(self, robot, executor, name, on_start=None):
+        self.robot = robot
+        self.executor = executor
+        self.name = name
+        self.on_start = on_start
+        self.loop = command_loop(robot, executor, on_start)
+        self.trajectory = []
+        self.cmd_end_times = []
+        # why the robot stopped early, e.g. a PLANTO with no path to its target
+        self.error = None
+
+    @property
+    def done(self):
+        return self.executor.done or self.error is not None
+
+    def advance(self):
+        # returns the command processed this step, None once the robot is done
+        try:
+            return next(self.loop, None)
+        except ValueError as e:
+            self.error = str(e)
+            self.robot.velocity = 0
+            self.robot.heading_velocity = 0
+            return None
+
+    def restart(self):
+        # a fresh generator, for when the executor's commands or position in them changed
+        self.error = None
+        self.loop = command_loop(self.robot, self.executor, self.on_start)
+
+    def extend(self, cmds):
+        """
+        Add commands to the end of this robot's list, restarting it if it had finished.
+        """
+        was_done = self.done
+        cmds = compile_commands(cmds)
+        self.executor.check_targets(cmds)
+        self.executor.cmds.extend(cmds)
+        if was_done:
+            self.restart()
+
+
+class Scheduler:
+    """
+    Steps every robot's commands, then moves all robots and resolves collisions between them.
+    """
+
+    def __init__(self, world=None, planner=None, pos_tolerance=POS_TOLERANCE, record=True):
+        # optional collision.CollisionWorld, robots are pushed out of it and out of each other
+        self.world = world
+        # optional planner.Planner shared by every robot's PLANTO commands
+        self.planner = planner
+        self.pos_tolerance = pos_tolerance
+        self.record = record
+        self.tasks = []
+        self.sim_time = 0.0
+        self.steps = 0
+
+    def add(self, robot, cmds, name=None, verbose=False, on_start=None):
+        executor = CommandExecutor(cmds, pos_tolerance=self.pos_tolerance, verbose=verbose, planner=self.planner)
+        task = RobotTask(robot, executor, name if name is not None else f"robot {len(self.tasks)}", on_start)
+        self.tasks.append(task)
+        return task
+
+    @property
+    def robots(self):
+        return [task.robot for task in self.tasks]
+
+    @property
+    def done(self):
+        return all(task.done for task in self.tasks)
+
+    def step(self, dt):
+        self.advance()
+        self.move(dt)
+
+    def advance(self):
+        # first half of a step: every robot's executor sets its velocities
+        for task in self.tasks:
+            task.advance()
+
+    def move(self, dt):
+        # second half: move the robots, then record the time, command ends and trajectories
+        robots = self.robots
+        for robot in robots:
+            robot.update_position(dt)
+        if self.world is not None:
+            self.world.resolve(robots)
+        self.sim_time += dt
+        self.steps += 1
+        for task in self.tasks:
+            while len(task.cmd_end_times) < task.executor.cmd_index:
+                task.cmd_end_times.append(self.sim_time)
+            if self.record:
+                robot = task.robot
+                task.trajectory.append((self.sim_time, robot.x, robot.y, robot.heading, task.executor.cmd_index))
+
+    def run(self, dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME):
+        """
+        Step until every robot has finished or max_time seconds have passed.
+        Returns a SimResult per robot, in the order they were added.
+        """
+        max_steps = int(round(max_time / dt))
+        while not self.done and self.steps < max_steps:
+            self.step(dt)
+        results = []
+        for task in self.tasks:
+            # a robot that finished early is timed by its own last command
+            sim_time = task.cmd_end_times[-1] if task.executor.done and task.cmd_end_times else self.sim_time
+            results.append(SimResult(task.robot, task.executor.done, sim_time, self.steps, task.trajectory, task.cmd_end_times))
+        return results
@@ -0,0 +1,67 @@
+# sprite_cache.py
+# Cache of rotated robot images so draw_robot does not call pygame.transform.rotate every frame.
+
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_RESOLUTION = 1.0  # degrees between cached rotations
+DEFAULT_MAX_ENTRIES = 1024  # rotated surfaces kept before evicting the least recently used
+
+
+def image_key(robot):
+    """
+    Robots loaded from the same file at the same size share cache entries.
+    """
+    return robot.image_file, robot.image_width, robot.image_height
+
+
+class RotationCache:
+    """
+    LRU cache of rotated surfaces keyed on (image key, heading quantized to resolution degrees).
+    """
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION, max_entries=DEFAULT_MAX_ENTRIES):
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def quantize(self, heading):
+        # snap to the nearest multiple of resolution, in [0, 360)
+        angle = (round(heading / self.resolution) * self.resolution) % 360
+        return round(angle, 6)
+
+    def get(self, key, image, heading):
+        """
+        Return image rotated by heading degrees (CCW), from the cache when possible.
+        """
+        angle = self.quantize(heading)
+        cache_key = (key, angle)
+        rotated = self._surfaces.get(cache_key)
+        if rotated is not None:
+            self._surfaces.move_to_end(cache_key)
+            self.hits += 1
+            return rotated
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(image, angle)
+        self._surfaces[cache_key] = rotated
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return rotated
+
+    def clear(self):
+        self._surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# shared by every robot drawn with the default cache
+rotation_cache = RotationCache()
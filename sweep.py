@@ -0,0 +1,143 @@
+# sweep.py
+# Run every combination of start pose and command parameters headless,
+# spread across all cores, and stream the results to a CSV file.
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+
+from robot import Robot
+from commands import DRIVE, TURN, GOTO, SPINTO, PLANTO, MAIN_CMDS
+from headless import run_headless, DEFAULT_DT, DEFAULT_MAX_TIME
+from routine import load_routine
+
+# start pose parameters, everything else is a command field
+POSE_PARAMS = ("x", "y", "heading")
+# position of each sweepable field in a command tuple
+CMD_FIELDS = {
+    DRIVE: {"distance": 2, "velocity": 3},
+    TURN: {"distance": 2, "velocity": 3},
+    GOTO: {"target_x": 1, "target_y": 2, "velocity": 3},
+    SPINTO: {"target_x": 1, "target_y": 2, "velocity": 3},
+    PLANTO: {"target_x": 1, "target_y": 2, "velocity": 3},
+}
+
+
+def apply_params(cmds, params):
+    """
+    Return a copy of cmds with params applied.
+    A plain field name like "velocity" sets that field on every command that has it,
+    "velocity.2" sets it on command 2 only. Start pose keys are ignored here.
+    """
+    cmds = [list(cmd_info) for cmd_info in cmds]
+    for name, value in params.items():
+        if name in POSE_PARAMS:
+            continue
+        field, _, index = name.partition(".")
+        targets = [int(index)] if index else range(len(cmds))
+        for i in targets:
+            fields = CMD_FIELDS[cmds[i][0]]
+            if field in fields:
+                cmds[i][fields[field]] = value
+            elif index:
+                raise ValueError(f"command {i} {tuple(cmds[i])} has no field {field}")
+    return [tuple(cmd_info) for cmd_info in cmds]
+
+
+def param_grid(ranges):
+    """
+    Yield one params dict for every combination of the values in ranges.
+    """
+    names = list(ranges)
+    for values in itertools.product(*(ranges[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def run_variant(task):
+    # process pool worker: one headless run, returned as a flat CSV row
+    index, base_cmds, start, params, dt, max_time = task
+    pose = dict(start)
+    pose.update((k, v) for k, v in params.items() if k in POSE_PARAMS)
+    robot = Robot(x=pose["x"], y=pose["y"], heading=pose["heading"])
+    result = run_headless(robot, apply_params(base_cmds, params), dt=dt, max_time=max_time, record=False)
+    row = {"variant": index}
+    row.update(params)
+    row.update({
+        "completed": result.completed,
+        "completion_time": result.sim_time,
+        "final_x": result.x,
+        "final_y": result.y,
+        "final_heading": result.heading,
+    })
+    durations = result.cmd_durations
+    for i in range(len(base_cmds)):
+        row[f"cmd_{i}_duration"] = durations[i] if i < len(durations) else ""
+    return row
+
+
+def run_sweep(base_cmds, ranges, out_file, start=(0, 0, 0), processes=None, dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME):
+    """
+    Run base_cmds for every combination in ranges (a dict of parameter name -> values)
+    on a process pool, writing each result row to out_file as soon as it finishes.
+    start is the (x, y, heading) pose used for any pose parameter not in ranges.
+    Returns the number of variants run.
+    """
+    start = dict(zip(POSE_PARAMS, start))
+    tasks = (
+        (i, base_cmds, start, params, dt, max_time)
+        for i, params in enumerate(param_grid(ranges))
+    )
+    fieldnames = ["variant"] + list(ranges) + ["completed", "completion_time", "final_x", "final_y", "final_heading"]
+    fieldnames += [f"cmd_{i}_duration" for i in range(len(base_cmds))]
+
+    count = 0
+    with open(out_file, "w", newline="") as f, multiprocessing.Pool(processes) as pool:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in pool.imap_unordered(run_variant, tasks, chunksize=16):
+            writer.writerow(row)
+            f.flush()
+            count += 1
+    return count
+
+
+def parse_range(text):
+    """
+    Parse "start:stop:step" (stop included) or a comma separated list of values.
+    """
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [start + i * step for i in range(count)]
+    return [float(v) for v in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep an autonomous routine over start poses and command parameters")
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--routine", help="routine file to sweep, default is the main() routine")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, default is one per core")
+    parser.add_argument("--dt", type=float, default=DEFAULT_DT)
+    parser.add_argument("--max-time", type=float, default=DEFAULT_MAX_TIME)
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=RANGE",
+                        help="e.g. x=250:350:10 or velocity.0=5,10,20")
+    args = parser.parse_args()
+
+    cmds = list(MAIN_CMDS)
+    if args.routine:
+        cmds = load_routine(args.routine)
+    ranges = {}
+    for param in args.param:
+        name, _, text = param.partition("=")
+        ranges[name] = parse_range(text)
+    if not ranges:
+        ranges = {"x": parse_range("250:350:10"), "y": parse_range("250:350:10")}
+
+    count = run_sweep(cmds, ranges, args.out, start=(300, 300, 0), processes=args.processes,
+                      dt=args.dt, max_time=args.max_time)
+    print(f"Wrote {count} variants to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
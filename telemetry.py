@@ -0,0 +1,246 @@
+# telemetry.py
+# Local telemetry server: streams robot state to dashboards and test harnesses, and takes
+# new commands for the running simulation.
+#
+# The server runs an asyncio loop on its own thread. The simulation loop only calls publish(),
+# which packs a frame and swaps it in, and poll(), which hands commands that clients sent to the
+# simulation and answers each with ACK or ERROR, so it never waits on a socket.
+# Clients get the newest frame at most rate times a second;
+# a client that has not read what it was sent skips frames rather than queueing them.
+#
+# Every message in either direction is a 4 byte little endian length, then that many bytes,
+# starting with a one byte message type:
+#   STATE    server -> client  sim_time f8, robot count u16, then per robot:
+#                              x, y, heading, gps_heading, velocity, heading_velocity f4,
+#                              cmd_index i4, command text length u16, command text (utf-8)
+#   COMMAND  client -> server  robot index u16, routine text (utf-8), see routine.py
+#   ACK      server -> client  number of commands the simulation accepted u16
+#   ERROR    server -> client  message (utf-8)
+
+import asyncio
+import queue
+import struct
+import threading
+
+from routine import parse_routine, format_routine
+from utils import cartesian_heading_to_gps
+
+STATE, COMMAND, ACK, ERROR = 1, 2, 3, 4
+LENGTH = struct.Struct("<I")
+STATE_HEADER = struct.Struct("<BdH")
+ROBOT_STATE = struct.Struct("<6fiH")
+COMMAND_HEADER = struct.Struct("<BH")
+
+DEFAULT_RATE = 30  # frames per second sent to each client
+MAX_MESSAGE = 1 << 16  # bytes, larger client messages close the connection
+MAX_BUFFERED = 1 << 16  # bytes waiting to go to a client before it skips frames
+
+
+def pack(payload):
+    return LENGTH.pack(len(payload)) + payload
+
+
+def encode_state(sim_time, tasks):
+    """
+    STATE message for scheduler.RobotTasks (anything with .robot and .executor).
+    """
+    parts = [STATE_HEADER.pack(STATE, sim_time, len(tasks))]
+    for task in tasks:
+        robot, executor = task.robot, task.executor
+        cmd_info = executor.current_cmd_info
+        text = format_routine([cmd_info]).strip().encode() if cmd_info else b""
+        gps_heading = cartesian_heading_to_gps((robot.heading + 180) % 360 - 180)
+        parts.append(ROBOT_STATE.pack(robot.x, robot.y, robot.heading, gps_heading, robot.velocity,
+                                      robot.heading_velocity, executor.cmd_index, len(text)))
+        parts.append(text)
+    return pack(b"".join(parts))
+
+
+def decode_state(payload):
+    """
+    (sim_time, robots) from a STATE payload, robots is a list of dicts.
+    """
+    _, sim_time, count = STATE_HEADER.unpack_from(payload)
+    offset = STATE_HEADER.size
+    robots = []
+    for _ in range(count):
+        x, y, heading, gps_heading, velocity, heading_velocity, cmd_index, length = \
+            ROBOT_STATE.unpack_from(payload, offset)
+        offset += ROBOT_STATE.size
+        command = payload[offset:offset + length].decode()
+        offset += length
+        robots.append({"x": x, "y": y, "heading": heading, "gps_heading": gps_heading, "velocity": velocity,
+                       "heading_velocity": heading_velocity, "cmd_index": cmd_index, "command": command or None})
+    return sim_time, robots
+
+
+def encode_command(robot_index, text):
+    return pack(COMMAND_HEADER.pack(COMMAND, robot_index) + text.encode())
+
+
+def encode_ack(count):
+    return pack(struct.pack("<BH", ACK, count))
+
+
+def encode_error(message):
+    return pack(bytes([ERROR]) + message.encode())
+
+
+def extend_tasks(tasks):
+    """
+    poll() callback that adds the commands to the end of tasks[robot_index], see scheduler.RobotTask.extend.
+    """
+    def accept(robot_index, cmds):
+        if not 0 <= robot_index < len(tasks):
+            raise ValueError(f"no robot {robot_index}")
+        tasks[robot_index].extend(cmds)
+    return accept
+
+
+async def read_message(reader):
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if length > MAX_MESSAGE:
+        raise ValueError(f"message of {length} bytes is too long")
+    return await reader.readexactly(length)
+
+
+class TelemetryServer:
+    """
+    Serves on TCP host:port, or on a Unix socket at unix_path if given.
+    port=0 picks a free port, see .port once started.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, unix_path=None, rate=DEFAULT_RATE):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.rate = rate
+        # newest STATE message and its sequence number, replaced as a pair
+        self.latest = (0, None)
+        self.commands = queue.Queue()
+        self.clients = 0
+        # writer of each connected client, keyed by its handle_client task, hung up on by close()
+        self.connections = {}
+        self.sent = 0
+        self.skipped = 0
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.stopped = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def serve(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.main())
+        self.loop.close()
+
+    async def main(self):
+        self.stopped = asyncio.Event()
+        if self.unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path=self.unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        async with server:
+            await self.stopped.wait()
+            # hang up on connected clients and let their handlers finish before the loop closes
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+
+    def close(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopped.set)
+            self.thread.join()
+
+    # simulation side, called from the main loop
+
+    def publish(self, sim_time, tasks):
+        seq, _ = self.latest
+        self.latest = (seq + 1, encode_state(sim_time, tasks))
+
+    def poll(self, accept):
+        """
+        Hand the commands clients sent since the last poll to accept(robot_index, compiled commands),
+        e.g. extend_tasks(scheduler.tasks). The client gets ACK, or ERROR if accept raised ValueError.
+        Returns the accepted (robot_index, commands) pairs.
+        """
+        accepted = []
+        while True:
+            try:
+                writer, robot_index, cmds = self.commands.get_nowait()
+            except queue.Empty:
+                return accepted
+            try:
+                accept(robot_index, cmds)
+            except ValueError as e:
+                self.reply(writer, encode_error(str(e)))
+            else:
+                self.reply(writer, encode_ack(len(cmds)))
+                accepted.append((robot_index, cmds))
+
+    def reply(self, writer, message):
+        def write():
+            if not writer.is_closing():
+                writer.write(message)
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(write)
+
+    # server side, on the asyncio thread
+
+    async def handle_client(self, reader, writer):
+        handler = asyncio.current_task()
+        self.connections[handler] = writer
+        self.clients += 1
+        sender = asyncio.ensure_future(self.send_states(writer))
+        try:
+            while True:
+                payload = await read_message(reader)
+                if payload[:1] != bytes([COMMAND]):
+                    raise ValueError(f"unexpected message type {payload[:1]}")
+                if len(payload) < COMMAND_HEADER.size:
+                    writer.write(encode_error(f"COMMAND message of {len(payload)} bytes is too short"))
+                    continue
+                _, robot_index = COMMAND_HEADER.unpack_from(payload)
+                try:
+                    cmds = parse_routine(payload[COMMAND_HEADER.size:].decode(), source="telemetry")
+                except ValueError as e:
+                    writer.write(encode_error(str(e)))
+                    continue
+                # answered by poll() once the simulation has taken or refused them
+                self.commands.put((writer, robot_index, cmds))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            self.clients -= 1
+            del self.connections[handler]
+            writer.close()
+
+    async def send_states(self, writer):
+        last_seq = 0
+        while True:
+            await asyncio.sleep(1 / self.rate)
+            seq, message = self.latest
+            if seq == last_seq:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                # slow client, it gets the newest frame once it catches up
+                self.skipped += 1
+                continue
+            writer.write(message)
+            self.sent += 1
+            last_seq = seq
@@ -1,8 +1,42 @@
+import csv
+import math
+import os
+import tempfile
+import time
 import unittest
 from utils import cartesian_cw_or_ccw, cartesian_heading_to_gps, cartesian_to_screen, find_distance, angle_between_positions
 from utils import CW, CCW
 from utils import smallest_angle_difference
 from utils import gps_heading_to_cartesian
+from robot import Robot
+from commands import DRIVE, TURN, GOTO, SPINTO, FORWARD, REVERSE, RIGHT
+from headless import run_headless, HeadlessSimulation
+from checkpoint import fork, run_until, run_forks, save_checkpoint, load_checkpoint
+from fleet import RobotFleet, run_fleet
+from montecarlo import NoiseModel, run_monte_carlo
+from sweep import apply_params, run_sweep
+from optimize import optimize, Evaluator, Objective
+from analytic import run_event_driven
+from integrators import ARC, RK4, arc_step, rk4_step, euler_step
+from trajectory_log import TrajectoryWriter, TrajectoryLog
+from benchmarks import compare, run_benchmarks
+from profiler import FrameProfiler, PHASES, percentile
+from commands import CommandExecutor, Drive, compile_commands
+from routine import parse_routine, format_routine, load_routine
+import array_utils
+from collision import CollisionWorld, OrientedRect, Body, separation
+from planner import Planner, astar
+from commands import PLANTO, LEFT
+from scheduler import Scheduler, command_loop
+import telemetry
+import utils
+from sprite_cache import RotationCache
+import assets
+from field_layer import FieldLayer, WHITE, BLACK
+from hud import Hud
+from frame_export import FrameExporter, RAW, DROP
+from vex_simulator import run_simulator, run_match
+from hot_reload import first_changed, RoutineWatcher, StartPoses, reload_task, ReloadableRun, START
 
 class TestVexSimulator(unittest.TestCase):
 
@@ -118,5 +152,1043 @@ class TestVexSimulator(unittest.TestCase):
         self.assertAlmostEqual(find_distance((0, 0), (3, 4)), 5.0)
         self.assertAlmostEqual(find_distance((1, 2), (4, 6)), 5.0)
 
+class TestHeadless(unittest.TestCase):
+
+    cmds = [
+        (DRIVE, FORWARD, 20, 10),
+        (DRIVE, REVERSE, 20, 10),
+        (TURN, RIGHT, 90, 20),
+        (SPINTO, 350, 250, 20),
+        (GOTO, 100, 100, 10),
+    ]
+
+    def test_drive_forward(self):
+        result = run_headless(Robot(x=0, y=0, heading=0), [(DRIVE, FORWARD, 20, 10)])
+        self.assertTrue(result.completed)
+        self.assertAlmostEqual(result.x, 20, delta=2)
+        self.assertAlmostEqual(result.y, 0)
+        # 20 units at 10 units/sec
+        self.assertAlmostEqual(result.sim_time, 2.0, delta=0.25)
+        self.assertEqual(len(result.trajectory), result.steps)
+
+    def test_main_routine(self):
+        result = run_headless(Robot(x=300, y=300, heading=0), self.cmds, dt=0.01)
+        self.assertTrue(result.completed)
+        self.assertLessEqual(find_distance((result.x, result.y), (100, 100)), 2)
+        self.assertEqual(result.trajectory[-1][4], len(self.cmds))
+
+    def test_cmd_durations(self):
+        result = run_headless(Robot(), [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 45)], dt=0.01)
+        durations = result.cmd_durations
+        self.assertEqual(len(durations), 2)
+        self.assertAlmostEqual(durations[0], 1.8, delta=0.05)
+        self.assertAlmostEqual(durations[1], 88 / 45, delta=0.05)
+        self.assertAlmostEqual(sum(durations), result.sim_time)
+
+    def test_max_time(self):
+        result = run_headless(Robot(), [(DRIVE, FORWARD, 1000, 1)], max_time=1.0)
+        self.assertFalse(result.completed)
+        self.assertAlmostEqual(result.sim_time, 1.0)
+
+class TestCheckpoint(unittest.TestCase):
+
+    prefix = [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 20)]
+    tail_a = [(GOTO, 100, 100, 10)]
+    tail_b = [(SPINTO, -100, 0, 20), (DRIVE, FORWARD, 30, 10)]
+
+    def assertSameRun(self, result, expected):
+        self.assertEqual(result.final_pose, expected.final_pose)
+        self.assertEqual(result.cmd_end_times, expected.cmd_end_times)
+        self.assertEqual(result.trajectory, expected.trajectory)
+
+    def test_save_and_resume(self):
+        cmds = self.prefix + self.tail_a
+        sim = HeadlessSimulation(Robot(x=300, y=300), cmds)
+        for _ in range(50):
+            sim.step()  # part way through the first DRIVE
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.ckpt")
+            save_checkpoint(sim, path)
+            resumed = load_checkpoint(path)
+        self.assertIsNot(resumed.robot, sim.robot)
+        self.assertSameRun(resumed.run(), run_headless(Robot(x=300, y=300), cmds))
+
+    def test_forks(self):
+        sim = HeadlessSimulation(Robot(x=300, y=300), self.prefix + self.tail_a)
+        self.assertTrue(run_until(sim, len(self.prefix)))
+        shared_time = sim.sim_time
+        result_a, result_b = run_forks(sim, [self.prefix + self.tail_a, self.prefix + self.tail_b])
+        self.assertSameRun(result_a, run_headless(Robot(x=300, y=300), self.prefix + self.tail_a))
+        self.assertSameRun(result_b, run_headless(Robot(x=300, y=300), self.prefix + self.tail_b))
+        # the original is untouched
+        self.assertEqual(sim.sim_time, shared_time)
+
+        with self.assertRaises(ValueError):
+            fork(sim, self.tail_b)
+
+    def test_planto_mid_waypoints(self):
+        world = CollisionWorld.field(800, 800)
+        world.add_static(OrientedRect(0, 0, 40, 500), "barrier")
+        planner = Planner(world)
+        cmds = [(PLANTO, 200, 0, 30)]
+        sim = HeadlessSimulation(Robot(x=-200, y=0, image_width=50, image_height=50), cmds, world=world,
+                                 planner=planner)
+        for _ in range(300):
+            sim.step()
+        self.assertIsNotNone(sim.executor.waypoints)
+        expected = run_headless(Robot(x=-200, y=0, image_width=50, image_height=50), cmds, world=world,
+                                planner=planner)
+        self.assertSameRun(fork(sim).run(), expected)
+
+class TestFleet(unittest.TestCase):
+
+    def test_matches_single_robot(self):
+        starts = [(300, 300, 0), (-100, 50, 45), (0, -200, -120)]
+        fleet = RobotFleet(len(starts), x=[s[0] for s in starts], y=[s[1] for s in starts], heading=[s[2] for s in starts])
+        result = run_fleet(fleet, TestHeadless.cmds, dt=0.01)
+        self.assertTrue(result.completed.all())
+        for i, (x, y, heading) in enumerate(starts):
+            single = run_headless(Robot(x=x, y=y, heading=heading), TestHeadless.cmds, dt=0.01)
+            self.assertAlmostEqual(fleet.x[i], single.x, places=6)
+            self.assertAlmostEqual(fleet.y[i], single.y, places=6)
+            self.assertAlmostEqual(fleet.heading[i], single.heading, places=6)
+            self.assertAlmostEqual(result.completion_time[i], single.sim_time, places=6)
+
+    def test_per_robot_cmds(self):
+        fleet = RobotFleet(2)
+        cmds = [[(DRIVE, FORWARD, 20, 10)], [(TURN, RIGHT, 90, 45), (DRIVE, REVERSE, 10, 10)]]
+        result = run_fleet(fleet, cmds, dt=0.01)
+        self.assertTrue(result.completed.all())
+        self.assertAlmostEqual(fleet.x[0], 20, delta=2)
+        self.assertAlmostEqual(fleet.heading[1], -90, delta=2)
+        self.assertAlmostEqual(fleet.y[1], 10, delta=2.5)
+        self.assertLess(result.completion_time[0], result.completion_time[1])
+
+    def test_unknown_command(self):
+        with self.assertRaises(ValueError):
+            run_fleet(RobotFleet(1), [("JUMP", 1, 2, 3)])
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def test_no_noise_matches_nominal(self):
+        result = run_monte_carlo(TestHeadless.cmds, 20, start=(300, 300, 0), batch_size=8, seed=0)
+        single = run_headless(Robot(x=300, y=300, heading=0), TestHeadless.cmds)
+        self.assertEqual(result.trials, 20)
+        self.assertTrue(result.completed.all())
+        self.assertAlmostEqual(result.nominal[0], single.x, places=6)
+        self.assertAlmostEqual(result.nominal[1], single.y, places=6)
+        self.assertAlmostEqual(float(result.position_error.max()), 0, places=6)
+        self.assertEqual(list(result.command_success), [1.0] * len(TestHeadless.cmds))
+        for t in result.completion_time:
+            self.assertAlmostEqual(t, single.sim_time, places=6)
+
+    def test_noise(self):
+        cmds = [(DRIVE, FORWARD, 100, 20), (TURN, RIGHT, 90, 30)]
+        noise = NoiseModel(velocity_scale_sd=0.1, start_heading_sd=2)
+        result = run_monte_carlo(cmds, 300, noise=noise, batch_size=128, seed=2)
+        summary = result.summary()
+        self.assertGreater(summary["position_error"]["mean"], 0.5)
+        self.assertLessEqual(summary["position_error"]["p50"], summary["position_error"]["p99"])
+        # same seed, same trials
+        again = run_monte_carlo(cmds, 300, noise=noise, batch_size=128, seed=2)
+        self.assertTrue((again.final_x == result.final_x).all())
+
+    def test_command_success(self):
+        # heading drift makes a long DRIVE miss its target point most of the time
+        result = run_monte_carlo([(DRIVE, FORWARD, 100, 20)], 200, noise=NoiseModel(heading_drift_sd=10),
+                                 max_time=20, seed=2)
+        self.assertLess(result.command_success[0], 0.5)
+        self.assertTrue(math.isnan(result.completion_time[~result.completed][0]))
+
+class TestSweep(unittest.TestCase):
+
+    def test_apply_params(self):
+        cmds = [(DRIVE, FORWARD, 20, 10), (GOTO, 100, 100, 10)]
+        self.assertEqual(apply_params(cmds, {"velocity": 5, "x": 3}), [(DRIVE, FORWARD, 20, 5), (GOTO, 100, 100, 5)])
+        self.assertEqual(apply_params(cmds, {"distance": 40}), [(DRIVE, FORWARD, 40, 10), (GOTO, 100, 100, 10)])
+        self.assertEqual(apply_params(cmds, {"target_x.1": 50}), [(DRIVE, FORWARD, 20, 10), (GOTO, 50, 100, 10)])
+        with self.assertRaises(ValueError):
+            apply_params(cmds, {"distance.1": 40})
+
+    def test_run_sweep(self):
+        cmds = [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 45)]
+        with tempfile.TemporaryDirectory() as tmp:
+            out_file = os.path.join(tmp, "sweep.csv")
+            count = run_sweep(cmds, {"x": [0, 100], "velocity.0": [10, 20]}, out_file, processes=2, dt=0.01)
+            with open(out_file) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(count, 4)
+        self.assertEqual(sorted(int(row["variant"]) for row in rows), [0, 1, 2, 3])
+        for row in rows:
+            self.assertEqual(row["completed"], "True")
+            self.assertAlmostEqual(float(row["final_x"]), float(row["x"]) + 20, delta=2)
+            self.assertAlmostEqual(float(row["cmd_0_duration"]), 18 / float(row["velocity.0"]), delta=0.05)
+
+class TestOptimize(unittest.TestCase):
+
+    def test_fastest_velocity(self):
+        cmds = [(DRIVE, FORWARD, 100, 10), (TURN, LEFT, 90, 20)]
+        result = optimize(cmds, {"velocity.0": (5, 50), "velocity.1": (10, 90)}, initial={"velocity.0": 10,
+                          "velocity.1": 20}, processes=1)
+        self.assertTrue(result.feasible)
+        self.assertGreater(result.params["velocity.0"], 45)
+        self.assertGreater(result.params["velocity.1"], 80)
+        self.assertLess(result.row["completion_time"], 100 / 45 + 90 / 80 + 0.2)
+
+    def test_pose_constraint(self):
+        # turns that overshoot 90 by more than half a degree do not count, whatever their speed
+        cmds = [(TURN, LEFT, 90, 20)]
+        result = optimize(cmds, {"velocity": (10, 300)}, initial={"velocity": 20}, target_pose=(0, 0, 90),
+                          max_heading_error=0.5, processes=1)
+        self.assertTrue(result.feasible)
+        self.assertLessEqual(abs(result.row["final_heading"] - 90), 0.5)
+        self.assertLess(result.row["completion_time"], 1.0)
+
+    def test_memo(self):
+        evaluator = Evaluator([(DRIVE, FORWARD, 100, 10)], {"velocity": (5, 50)}, (0, 0, 0),
+                              Objective((100, 0, 0)), None, 1 / 60, 60)
+        first, second, clipped = evaluator.costs([[0.5], [0.5], [1.5]])
+        self.assertEqual(first, second)
+        self.assertEqual(len(evaluator.memo), 2)
+        self.assertEqual(evaluator.memo_hits, 1)
+        self.assertEqual(evaluator.costs([[1.0]]), [clipped])
+        self.assertEqual(evaluator.memo_hits, 2)
+
+class TestEventDriven(unittest.TestCase):
+
+    def test_exact_durations(self):
+        cmds = [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 20), (SPINTO, 0, 100, 20)]
+        result = run_event_driven(Robot(x=0, y=0, heading=0), cmds)
+        self.assertTrue(result.completed)
+        self.assertEqual(result.steps, 3)
+        # stops as soon as it is within tolerance of each target
+        self.assertAlmostEqual(result.cmd_durations[0], 1.8)
+        self.assertAlmostEqual(result.cmd_durations[1], 4.4)
+        self.assertAlmostEqual(result.x, 18)
+        # SPINTO stops 1 degree short of pointing at the target
+        angle_to_target = angle_between_positions((result.x, result.y), (0, 100))
+        self.assertAlmostEqual(smallest_angle_difference(angle_to_target, result.heading)[0], 1.0)
+
+    def test_matches_stepped_run(self):
+        start = dict(x=300, y=300, heading=0)
+        exact = run_event_driven(Robot(**start), TestHeadless.cmds, goto_dt=0.001)
+        stepped = run_headless(Robot(**start), TestHeadless.cmds, dt=0.001)
+        self.assertTrue(exact.completed)
+        self.assertAlmostEqual(exact.sim_time, stepped.sim_time, delta=0.05)
+        self.assertAlmostEqual(exact.x, stepped.x, delta=0.1)
+        self.assertAlmostEqual(exact.y, stepped.y, delta=0.1)
+        for exact_duration, stepped_duration in zip(exact.cmd_durations, stepped.cmd_durations):
+            self.assertAlmostEqual(exact_duration, stepped_duration, delta=0.01)
+
+    def test_never_finishes(self):
+        result = run_event_driven(Robot(), [(DRIVE, FORWARD, 20, 0)], max_time=5)
+        self.assertFalse(result.completed)
+        self.assertAlmostEqual(result.sim_time, 5)
+
+    def test_cut_off_part_way(self):
+        # the command still running at max_time leaves the robot where a stepped run does
+        for cmds in ([(DRIVE, FORWARD, 100, 10)], [(DRIVE, FORWARD, 5, 10), (TURN, LEFT, 180, 20)],
+                     [(SPINTO, -100, 100, 10)]):
+            exact = run_event_driven(Robot(x=10, y=20, heading=30), cmds, max_time=3)
+            stepped = run_headless(Robot(x=10, y=20, heading=30), cmds, max_time=3)
+            self.assertFalse(exact.completed)
+            self.assertFalse(stepped.completed)
+            # up to two frames apart, the stepped run only ends commands on frame boundaries
+            for value, stepped_value in zip(exact.final_pose, stepped.final_pose):
+                self.assertAlmostEqual(value, stepped_value, delta=1.0)
+
+    def test_rejects_unknown_commands(self):
+        with self.assertRaises(ValueError):
+            run_event_driven(Robot(), [(DRIVE, FORWARD, 20, 10), ("HOVER", 3)])
+
+class TestIntegrators(unittest.TestCase):
+
+    def test_arc_full_circle(self):
+        # 10 units/sec while turning 36 deg/sec is a circle of circumference 100
+        x, y, heading = arc_step(0, 0, 0, 10, 36, 10)
+        self.assertAlmostEqual(x, 0)
+        self.assertAlmostEqual(y, 0)
+        self.assertAlmostEqual(heading, 360)
+        x, y, heading = arc_step(0, 0, 0, 10, 36, 5)
+        self.assertAlmostEqual(y, 100 / math.pi)
+
+    def test_straight_line(self):
+        for step in (euler_step, arc_step, rk4_step):
+            x, y, heading = step(1, 2, 90, 10, 0, 0.5)
+            self.assertAlmostEqual(x, 1)
+            self.assertAlmostEqual(y, 7)
+            self.assertEqual(heading, 90)
+
+    def test_rk4_close_to_arc(self):
+        exact = arc_step(0, 0, 30, 10, 20, 1)
+        approx = rk4_step(0, 0, 30, 10, 20, 1)
+        for a, b in zip(exact, approx):
+            self.assertAlmostEqual(a, b, places=3)
+
+    def test_rk4_robot(self):
+        # GOTO turns and drives at once, where the integrators differ
+        start = dict(x=300, y=300, heading=0)
+        rk4 = run_headless(Robot(integrator=RK4, **start), TestHeadless.cmds)
+        arc = run_headless(Robot(integrator=ARC, **start), TestHeadless.cmds)
+        self.assertTrue(rk4.completed)
+        self.assertAlmostEqual(rk4.x, arc.x, delta=0.1)
+        self.assertAlmostEqual(rk4.y, arc.y, delta=0.1)
+        self.assertAlmostEqual(rk4.sim_time, arc.sim_time, delta=0.05)
+
+    def test_adaptive_large_steps(self):
+        start = dict(x=300, y=300, heading=0)
+        exact = run_event_driven(Robot(**start), TestHeadless.cmds, goto_dt=0.001)
+        result = run_headless(Robot(integrator=ARC, **start), TestHeadless.cmds, dt=1.0, adaptive=True)
+        self.assertTrue(result.completed)
+        self.assertLess(result.substeps, 200)
+        self.assertAlmostEqual(result.sim_time, exact.sim_time, delta=0.05)
+        self.assertAlmostEqual(result.x, exact.x, delta=0.2)
+        self.assertAlmostEqual(result.y, exact.y, delta=0.2)
+        # the same step without substepping overshoots and never finishes
+        self.assertFalse(run_headless(Robot(integrator=ARC, **start), TestHeadless.cmds, dt=1.0, max_time=60).completed)
+
+class TestTrajectoryLog(unittest.TestCase):
+
+    def test_record_and_seek(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.vlog")
+            with TrajectoryWriter(path, keyframe_interval=100) as writer:
+                result = run_headless(Robot(x=300, y=300), TestHeadless.cmds, dt=0.01, recorder=writer)
+            log = TrajectoryLog(path)
+            self.assertEqual(len(log), result.steps)
+            self.assertEqual(os.path.getsize(path), 16 + 32 * result.steps)
+            self.assertAlmostEqual(log[-1]["x"], result.x, places=3)
+            self.assertEqual(log[-1]["cmd_index"], len(TestHeadless.cmds))
+
+            for t in (0.0, 0.005, 1.234, 20.0, result.sim_time):
+                i = log.seek(t)
+                self.assertGreaterEqual(log[i]["time"], t - 1e-9)
+                if i:
+                    self.assertLess(log[i - 1]["time"], t)
+            self.assertEqual(log.seek(result.sim_time + 1), len(log))
+
+            # one command start per command, at the recorded end of the one before
+            starts = log.command_starts()
+            self.assertEqual(len(starts), len(TestHeadless.cmds) + 1)
+            for start, end_time in zip(starts[1:], result.cmd_end_times):
+                self.assertAlmostEqual(start["time"], end_time)
+
+            # appending continues the log
+            with TrajectoryWriter(path, append=True) as writer:
+                with self.assertRaises(ValueError):
+                    writer.append(result.sim_time, 0, 0, 0, 0, 0, 99)
+                writer.append(result.sim_time + 1, 0, 0, 0, 0, 0, 99)
+            log = TrajectoryLog(path)
+            self.assertEqual(len(log), result.steps + 1)
+            self.assertEqual(log.seek(result.sim_time + 0.5), result.steps)
+            self.assertEqual(len(list(log.frames(result.sim_time))), 2)
+
+            # a new writer starts a new log
+            with TrajectoryWriter(path) as writer:
+                writer.append(0.5, 0, 0, 0, 0, 0, 0)
+            log = TrajectoryLog(path)
+            self.assertEqual(len(log), 1)
+            self.assertEqual(len(log.keyframes), 1)
+            self.assertEqual(log.seek(0.25), 0)
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare(self):
+        baseline = {"a": 1.0, "b": 2.0}
+        results = {"a": 1.2, "b": 2.6, "c": 100.0}
+        self.assertEqual(compare(results, baseline, threshold=0.25), [("b", 2.6, 2.0)])
+        self.assertEqual(compare(results, baseline, threshold=0.5), [])
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(["find_distance", "cartesian_to_screen"])
+        self.assertEqual(sorted(results), ["cartesian_to_screen", "find_distance"])
+        self.assertTrue(all(seconds > 0 for seconds in results.values()))
+
+class TestProfiler(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_phases_and_hooks(self):
+        profiler = FrameProfiler(window=3)
+        seen = []
+        profiler.add_hook(lambda frame, timings: seen.append((frame, dict(timings))))
+        for _ in range(5):
+            profiler.begin_frame()
+            profiler.lap("events")
+            profiler.lap("hud")
+            profiler.lap("hud")
+            profiler.end_frame()
+        self.assertEqual([frame for frame, timings in seen], [0, 1, 2, 3, 4])
+        timings = seen[-1][1]
+        self.assertEqual(set(timings), set(PHASES) | {"frame"})
+        self.assertEqual(timings["display"], 0.0)
+        self.assertAlmostEqual(timings["frame"], sum(timings[phase] for phase in PHASES))
+
+        summary = profiler.summary()
+        self.assertLessEqual(summary["hud"]["p50"], summary["hud"]["p99"])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.csv")
+            profiler.export_csv(path)
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(set(rows[0]), set(PHASES) | {"frame"})
+
+class TestRoutine(unittest.TestCase):
+
+    text = """
+    # out and back
+    DRIVE FORWARD 20 10
+    drive reverse 20 10.5   # lower case is fine
+    TURN RIGHT 90 20
+    SPINTO 350 250 20
+    GOTO 100 -100 10
+    """
+
+    def test_parse(self):
+        cmds = parse_routine(self.text)
+        self.assertEqual(cmds, [
+            (DRIVE, FORWARD, 20, 10),
+            (DRIVE, REVERSE, 20, 10.5),
+            (TURN, RIGHT, 90, 20),
+            (SPINTO, 350, 250, 20),
+            (GOTO, 100, -100, 10),
+        ])
+        self.assertEqual(cmds[1].dir_sign, -1)
+        self.assertEqual(cmds[2].heading_change, -90)
+        self.assertEqual(cmds[4].target, (100, -100))
+        self.assertEqual(parse_routine(format_routine(cmds)), cmds)
+        self.assertEqual(repr(cmds[0]), repr((DRIVE, FORWARD, 20, 10)))
+
+    def test_errors(self):
+        for bad in ("JUMP 1 2 3", "DRIVE SIDEWAYS 20 10", "DRIVE FORWARD 20", "GOTO 1 north 10"):
+            with self.assertRaises(ValueError) as cm:
+                parse_routine("GOTO 0 0 10\n" + bad, source="bad.txt")
+            self.assertTrue(str(cm.exception).startswith("bad.txt:2: "), str(cm.exception))
+        with self.assertRaises(ValueError):
+            CommandExecutor([(DRIVE, FORWARD, "far", 10)])
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "auto.txt")
+            cache_dir = os.path.join(tmp, "cache")
+            with open(path, "w") as f:
+                f.write(self.text)
+            cmds = load_routine(path, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            cached = load_routine(path, cache_dir=cache_dir)
+            self.assertEqual(cached, cmds)
+            self.assertEqual(cached[2].heading_velocity, -20)
+            with open(path, "a") as f:
+                f.write("DRIVE FORWARD 5 5\n")
+            self.assertEqual(len(load_routine(path, cache_dir=cache_dir)), len(cmds) + 1)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_executor_accepts_compiled(self):
+        cmds = compile_commands(TestHeadless.cmds)
+        self.assertIsInstance(cmds[0], Drive)
+        compiled = run_headless(Robot(x=300, y=300), cmds)
+        raw = run_headless(Robot(x=300, y=300), TestHeadless.cmds)
+        self.assertEqual(compiled.final_pose, raw.final_pose)
+
+class TestArrayUtils(unittest.TestCase):
+
+    def test_angles_match_scalar(self):
+        import numpy as np
+        angles = np.arange(-350, 360, 10.0)
+        targets, currents = np.meshgrid(angles, angles)
+        angle_diff, direction = array_utils.smallest_angle_difference(targets, currents)
+        for target, current, diff, dirn in zip(targets.flat, currents.flat, angle_diff.flat, direction.flat):
+            self.assertEqual(smallest_angle_difference(target, current), (diff, dirn))
+
+        # the cases from test_smallest_angle_difference
+        angle_diff, direction = array_utils.smallest_angle_difference([10, 350, -170, 170, 180], [350, 10, 170, -170, 0])
+        self.assertEqual(angle_diff.tolist(), [20, 20, 20, 20, 180])
+        self.assertEqual(direction.tolist(), [CCW, CW, CCW, CW, CCW])
+
+        headings = np.arange(-179, 179, 1.0)
+        np.testing.assert_allclose(array_utils.cartesian_heading_to_gps(array_utils.gps_heading_to_cartesian(headings)), headings)
+        np.testing.assert_allclose(array_utils.gps_heading_to_cartesian(headings), [gps_heading_to_cartesian(h) for h in headings])
+
+    def test_positions_match_scalar(self):
+        import numpy as np
+        rng = np.random.default_rng(1)
+        pos1 = rng.uniform(-400, 400, (50, 2))
+        pos2 = rng.uniform(-400, 400, (50, 2))
+        headings = rng.uniform(-180, 180, 50)
+        np.testing.assert_allclose(array_utils.angle_between_positions(pos1, pos2),
+                                   [angle_between_positions(a, b) for a, b in zip(pos1, pos2)])
+        np.testing.assert_allclose(array_utils.find_distance(pos1, pos2), [find_distance(a, b) for a, b in zip(pos1, pos2)])
+        screen_x, screen_y = array_utils.cartesian_to_screen(pos1[:, 0], pos1[:, 1])
+        self.assertEqual(list(zip(screen_x.tolist(), screen_y.tolist())), [cartesian_to_screen(x, y) for x, y in pos1])
+
+        directions = np.array([FORWARD, REVERSE, "SIDEWAYS"] * 17)[:50]
+        moved = array_utils.add_distance(pos1, directions, 20, headings)
+        for p, direction, heading, m in zip(pos1, directions, headings, moved):
+            np.testing.assert_allclose(m, utils.add_distance(p, direction, 20, Robot(heading=heading)))
+        # a single position broadcast over many headings
+        self.assertEqual(array_utils.add_distance((0, 0), FORWARD, 10, headings).shape, (50, 2))
+
+class TestCollision(unittest.TestCase):
+
+    def test_separation(self):
+        a = OrientedRect(0, 0, 50, 50)
+        normal, depth = separation(a, OrientedRect(40, 0, 50, 50))
+        self.assertAlmostEqual(depth, 10)
+        self.assertAlmostEqual(normal[0], 1)
+        self.assertIsNone(separation(a, OrientedRect(60, 0, 50, 50)))
+        # a square turned 45 degrees reaches 35.4 from its center along x
+        self.assertIsNone(separation(a, OrientedRect(61, 0, 50, 50, 45)))
+        self.assertIsNotNone(separation(a, OrientedRect(59, 0, 50, 50, 45)))
+        # corner to corner: the bounding boxes overlap but the rects do not
+        self.assertIsNone(separation(OrientedRect(0, 0, 50, 50, 45), OrientedRect(40, 40, 50, 50, 45)))
+
+    def test_walls(self):
+        world = CollisionWorld.field(800, 800)
+        robot = Robot(x=390, y=0, image_width=50, image_height=50)
+        contacts = world.resolve([robot])
+        self.assertEqual([contact.b.name for contact in contacts], ["right wall"])
+        self.assertIsInstance(contacts[0].b, Body)  # static bodies, robot indexes for robots
+        self.assertAlmostEqual(robot.x, 375)
+        self.assertEqual(world.contacts([robot]), [])
+
+        # driving into the wall stops at the wall, so the DRIVE never finishes
+        robot = Robot(x=300, y=0, image_width=50, image_height=50)
+        result = run_headless(robot, [(DRIVE, FORWARD, 200, 50)], world=world, max_time=10)
+        self.assertFalse(result.completed)
+        self.assertAlmostEqual(robot.x, 375, delta=1)
+
+    def test_robot_pairs(self):
+        robots = [Robot(x=0, y=0, image_width=50, image_height=50), Robot(x=30, y=0, image_width=50, image_height=50)]
+        contacts = CollisionWorld().resolve(robots)
+        self.assertEqual([(contact.a, contact.b) for contact in contacts], [(0, 1)])
+        self.assertAlmostEqual(robots[0].x, -10)
+        self.assertAlmostEqual(robots[1].x, 40)
+
+    def test_broad_phase_matches_brute_force(self):
+        import random
+        rng = random.Random(3)
+        robots = [Robot(x=rng.uniform(-400, 400), y=rng.uniform(-400, 400), heading=rng.uniform(-180, 180),
+                        image_width=50, image_height=30) for _ in range(300)]
+        world = CollisionWorld()
+        world.add_static(OrientedRect(0, 0, 100, 20, 30), "bar")
+        found = {(c.a, c.b if isinstance(c.b, int) else c.b.name) for c in world.contacts(robots)}
+        rects = [OrientedRect(r.x, r.y, 50, 30, r.heading) for r in robots]
+        expected = {(i, j) for i in range(len(rects)) for j in range(i + 1, len(rects)) if separation(rects[i], rects[j])}
+        expected |= {(i, "bar") for i in range(len(rects)) if separation(rects[i], world.static_bodies[0].rect)}
+        self.assertEqual(found, expected)
+        self.assertTrue(expected)
+
+class TestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        # a barrier across the middle of the field with gaps at the top and bottom
+        self.world = CollisionWorld.field(800, 800)
+        self.world.add_static(OrientedRect(0, 0, 40, 500), "barrier")
+        self.planner = Planner(self.world)
+
+    def test_plan_goes_around(self):
+        waypoints = self.planner.plan((-200, 0), (200, 0))
+        self.assertEqual(waypoints[-1], (200, 0))
+        self.assertGreater(len(waypoints), 1)
+        self.assertTrue(all(abs(y) > 250 for x, y in waypoints[:-1]))
+
+    def test_distance_field_cached(self):
+        first = self.planner.plan((-200, 0), (200, 0))
+        self.assertEqual((self.planner.searches, self.planner.misses), (1, 0))  # one-off target, A* only
+        # the second plan to a target builds its field, later ones reuse it
+        self.assertEqual(self.planner.plan((-200, 0), (200, 0)), first)
+        self.planner.plan((-300, -100), (200, 0))
+        self.planner.plan((-100, 200), (202, 3))  # same target cell
+        self.assertEqual((self.planner.searches, self.planner.misses, self.planner.hits), (1, 1, 2))
+
+        # walking the cached field costs the same as a fresh A* search
+        grid = self.planner.grid
+        start, goal = grid.cell_at((-300, -100)), grid.cell_at((200, 0))
+        cost, path = astar(grid, start, goal)
+        self.assertAlmostEqual(cost, self.planner.fields[goal][start])
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], goal)
+
+    def test_planto(self):
+        robot = Robot(x=-200, y=0, image_width=50, image_height=50)
+        result = run_headless(robot, [(PLANTO, 200, 0, 30)], world=self.world, planner=self.planner)
+        self.assertTrue(result.completed)
+        self.assertAlmostEqual(robot.x, 200, delta=2)
+        self.assertAlmostEqual(robot.y, 0, delta=2)
+        # the planned path never touches the barrier
+        for _, x, y, heading, _ in result.trajectory:
+            self.assertEqual(self.world.contacts([Robot(x=x, y=y, heading=heading, image_width=50, image_height=50)]), [])
+
+        # without a planner PLANTO heads straight there, like GOTO
+        robot = Robot(x=-200, y=300)
+        result = run_headless(robot, [(PLANTO, 200, 300, 30)])
+        self.assertTrue(result.completed)
+        self.assertAlmostEqual(robot.y, 300, delta=2)
+
+    def test_planto_event_driven(self):
+        cmds = [(DRIVE, FORWARD, 10, 20), (PLANTO, 200, 0, 30)]
+        exact = run_event_driven(Robot(x=-200, y=0), cmds, planner=self.planner)
+        stepped = run_headless(Robot(x=-200, y=0), cmds, planner=self.planner)
+        self.assertTrue(exact.completed)
+        self.assertAlmostEqual(exact.x, stepped.x, delta=0.1)
+        self.assertAlmostEqual(exact.y, stepped.y, delta=0.1)
+        self.assertAlmostEqual(exact.sim_time, stepped.sim_time, delta=0.05)
+
+    def test_unreachable(self):
+        with self.assertRaises(ValueError):
+            self.planner.plan((-200, 0), (0, 0))
+
+    def test_executor_rejects_blocked_target(self):
+        with self.assertRaises(ValueError):
+            CommandExecutor([(DRIVE, FORWARD, 10, 20), (PLANTO, 0, 0, 30)], planner=self.planner)
+        scheduler = Scheduler(planner=self.planner)
+        task = scheduler.add(Robot(x=-200, y=0), [(PLANTO, 200, 0, 30)])
+        with self.assertRaises(ValueError):
+            task.extend([(PLANTO, 0, 100, 30)])
+        self.assertEqual(len(task.executor.cmds), 1)
+
+    def test_no_path_stops_robot(self):
+        # a free target boxed in on every side
+        for rect in [(200, 280, 200, 20), (200, 120, 200, 20), (120, 200, 20, 200), (280, 200, 20, 200)]:
+            self.world.add_static(OrientedRect(*rect), "box")
+        scheduler = Scheduler(planner=Planner(self.world))
+        stuck = scheduler.add(Robot(x=-200, y=0), [(DRIVE, FORWARD, 10, 20), (PLANTO, 200, 200, 30)])
+        other = scheduler.add(Robot(x=-200, y=300), [(DRIVE, FORWARD, 50, 20)])
+        stuck_result, other_result = scheduler.run()
+        self.assertIn("no path", stuck.error)
+        self.assertEqual(stuck.executor.cmd_index, 1)
+        self.assertEqual((stuck.robot.velocity, stuck.robot.heading_velocity), (0, 0))
+        self.assertFalse(stuck_result.completed)
+        self.assertTrue(other_result.completed)
+
+class TestScheduler(unittest.TestCase):
+
+    def test_matches_single_robot_runs(self):
+        routines = [
+            TestHeadless.cmds,
+            [(TURN, RIGHT, 45, 30), (DRIVE, FORWARD, 30, 15)],
+            [(GOTO, -100, 50, 20)],
+        ]
+        starts = [(300, 300, 0), (-300, 0, 90), (0, -300, 180)]
+        scheduler = Scheduler()
+        for (x, y, heading), cmds in zip(starts, routines):
+            scheduler.add(Robot(x=x, y=y, heading=heading), cmds)
+        results = scheduler.run()
+
+        for (x, y, heading), cmds, result in zip(starts, routines, results):
+            single = run_headless(Robot(x=x, y=y, heading=heading), cmds)
+            self.assertTrue(result.completed)
+            self.assertEqual(result.final_pose, single.final_pose)
+            self.assertEqual(result.cmd_end_times, single.cmd_end_times)
+            self.assertAlmostEqual(result.sim_time, single.sim_time)
+
+    def test_robots_collide(self):
+        # head on along the x axis, they stop where they meet
+        scheduler = Scheduler(world=CollisionWorld())
+        scheduler.add(Robot(x=-100, y=0, image_width=50, image_height=50), [(DRIVE, FORWARD, 200, 20)], name="red")
+        scheduler.add(Robot(x=100, y=0, heading=180, image_width=50, image_height=50), [(DRIVE, FORWARD, 200, 20)],
+                      name="blue")
+        results = scheduler.run(max_time=15)
+        self.assertFalse(any(result.completed for result in results))
+        red, blue = scheduler.robots
+        self.assertAlmostEqual(blue.x - red.x, 50, delta=1)
+
+    def test_command_loop(self):
+        robot = Robot()
+        started = []
+        loop = command_loop(robot, CommandExecutor([(TURN, RIGHT, 10, 100), (DRIVE, FORWARD, 5, 100)]),
+                            on_start=lambda i, cmd_info: started.append(i))
+        steps = 0
+        for _ in loop:
+            robot.update_position(1 / 60)
+            steps += 1
+        self.assertEqual(started, [0, 1])
+        self.assertGreater(steps, 2)
+
+    def test_advance_then_move(self):
+        # the window draws between the two halves of a step, the bookkeeping is the same
+        cmds = [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 20)]
+        stepped, split = Scheduler(), Scheduler()
+        stepped.add(Robot(x=300, y=300), cmds)
+        split.add(Robot(x=300, y=300), cmds)
+        expected, = stepped.run(dt=1 / 60)
+        while not split.done:
+            split.advance()
+            split.move(1 / 60)
+        self.assertEqual(split.steps, stepped.steps)
+        self.assertEqual(split.tasks[0].cmd_end_times, expected.cmd_end_times)
+        self.assertEqual(split.tasks[0].trajectory, expected.trajectory)
+
+    def test_run_match_needs_a_robot(self):
+        with self.assertRaises(ValueError):
+            run_match([])
+
+class TestAssets(unittest.TestCase):
+
+    def test_shared_surface(self):
+        assets.clear()
+        a = Robot(image_file="square_tank.jpg", image_width=50, image_height=50)
+        b = Robot(x=100, image_file="square_tank.jpg", image_width=50, image_height=50)
+        c = Robot(image_file="square_tank.jpg", image_width=30, image_height=30)
+        self.assertIs(a.robot_img, b.robot_img)
+        self.assertIsNot(a.robot_img, c.robot_img)
+        self.assertEqual(c.robot_img.get_size(), (30, 30))
+        self.assertEqual(b.robot_rect.center, (100, 0))
+
+    def test_headless_import_skips_pygame(self):
+        import subprocess
+        import sys
+        code = ("import sys, headless, sweep, scheduler\n"
+                "from robot import Robot\n"
+                "Robot(image_file='square_tank.jpg', image_width=50, image_height=50)\n"
+                "print('pygame' in sys.modules)")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+class TestRotationCache(unittest.TestCase):
+
+    def test_quantize(self):
+        cache = RotationCache(resolution=5)
+        self.assertEqual(cache.quantize(0), 0)
+        self.assertEqual(cache.quantize(7.4), 5)
+        self.assertEqual(cache.quantize(-3), 355)
+        self.assertEqual(cache.quantize(722), 0)
+
+    def test_hits_and_eviction(self):
+        import pygame
+        image = pygame.Surface((50, 20))
+        cache = RotationCache(resolution=1, max_entries=2)
+        first = cache.get("tank", image, 10.2)
+        self.assertIs(cache.get("tank", image, 9.8), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(first.get_size(), pygame.transform.rotate(image, 10).get_size())
+        cache.get("tank", image, 20)
+        cache.get("tank", image, 30)
+        self.assertEqual(len(cache), 2)
+        # 10 degrees was least recently used, so it is rotated again
+        self.assertIsNot(cache.get("tank", image, 10), first)
+        self.assertEqual(cache.misses, 4)
+
+class TestFieldLayer(unittest.TestCase):
+
+    def test_dirty_rects(self):
+        import pygame
+        screen = pygame.Surface((200, 200))
+        field = FieldLayer(200, 200)
+
+        field.begin_frame(screen)
+        self.assertEqual(screen.get_at((50, 50))[:3], WHITE)
+        self.assertEqual(screen.get_at((100, 50))[:3], BLACK)  # center line
+        field.mark(screen.fill(BLACK, pygame.Rect(40, 40, 20, 20)))
+        self.assertEqual(field.finish_frame(), [pygame.Rect(0, 0, 200, 200)])
+
+        # the next frame erases the old square and reports both squares
+        field.begin_frame(screen)
+        self.assertEqual(screen.get_at((50, 50))[:3], WHITE)
+        field.mark(screen.fill(BLACK, pygame.Rect(140, 140, 20, 20)))
+        self.assertEqual(field.finish_frame(), [pygame.Rect(40, 40, 20, 20), pygame.Rect(140, 140, 20, 20)])
+
+class TestHud(unittest.TestCase):
+
+    def test_only_changed_lines_render(self):
+        import pygame
+        pygame.font.init()
+        screen = pygame.Surface((200, 200))
+        hud = Hud([(5, 150), (5, 195)], max_entries=2, font=pygame.font.Font(None, 24))
+        cache = hud.text_cache
+
+        rects = hud.draw(screen, ["a", "b"])
+        self.assertEqual(len(rects), 2)
+        self.assertEqual(rects[0].bottomleft, (5, 150))
+        hud.draw(screen, ["a", "b"])
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        # blank lines are skipped, changed lines come from the cache when seen before
+        self.assertEqual(len(hud.draw(screen, [None, "c"])), 1)
+        hud.draw(screen, [None, "b"])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        # "a" was evicted to make room for "c"
+        self.assertEqual(len(cache), 2)
+        hud.draw(screen, ["d", "b"])
+        hud.draw(screen, ["a", "b"])
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+
+class TestFrameExport(unittest.TestCase):
+
+    def frames(self, count):
+        import pygame
+        for i in range(count):
+            surface = pygame.Surface((8, 4))
+            surface.fill((i, 0, 255 - i))
+            yield surface
+
+    def test_png(self):
+        import pygame
+        with tempfile.TemporaryDirectory() as tmp:
+            with FrameExporter(tmp, workers=3) as exporter:
+                for surface in self.frames(20):
+                    self.assertTrue(exporter.submit(surface))
+            self.assertEqual((exporter.written, exporter.dropped), (20, 0))
+            self.assertEqual(len(os.listdir(tmp)), 20)
+            image = pygame.image.load(exporter.frame_path(7))
+            self.assertEqual(image.get_at((0, 0))[:3], (7, 0, 248))
+
+    def test_raw_stream_in_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "frames.rgb")
+            with FrameExporter(path, fmt=RAW, workers=4) as exporter:
+                for surface in self.frames(10):
+                    exporter.submit(surface)
+            with open(path, "rb") as f:
+                data = f.read()
+            frame_size = 8 * 4 * 3
+            self.assertEqual(len(data), 10 * frame_size)
+            self.assertEqual([data[i * frame_size] for i in range(10)], list(range(10)))
+
+    def test_drop_policy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            exporter = FrameExporter(os.path.join(tmp, "frames.rgb"), fmt=RAW, queue_size=1, policy=DROP)
+            # hold the writer up so the queue fills
+            exporter.lock.acquire()
+            results = [exporter.submit(surface) for surface in self.frames(10)]
+            exporter.lock.release()
+            exporter.close()
+            self.assertIn(False, results)
+            self.assertEqual(exporter.written + exporter.dropped, 10)
+            self.assertEqual(exporter.dropped, results.count(False))
+            self.assertEqual(exporter.frames, exporter.written)
+
+    def test_drop_keeps_png_numbering(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            exporter = FrameExporter(tmp, workers=1, queue_size=1, policy=DROP)
+            exporter.lock.acquire()
+            results = [exporter.submit(surface) for surface in self.frames(10)]
+            exporter.lock.release()
+            exporter.close()
+            self.assertIn(False, results)
+            names = sorted(os.listdir(tmp))
+            self.assertEqual(names, [os.path.basename(exporter.frame_path(i)) for i in range(len(names))])
+
+    def test_offscreen_run(self):
+        robot = Robot(x=0, y=0, image_file="square_tank.jpg", image_width=50, image_height=50)
+        with tempfile.TemporaryDirectory() as tmp:
+            with FrameExporter(tmp, fps=30) as exporter:
+                run_simulator(robot, [(DRIVE, FORWARD, 10, 20)], exporter=exporter)
+            # runs until the command finishes, then stops on its own
+            self.assertAlmostEqual(robot.x, 10, delta=2)
+            self.assertEqual(exporter.written, exporter.frames)
+            self.assertGreater(exporter.frames, 10)
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def read_message(self, sock):
+        def read_exactly(n):
+            data = b""
+            while len(data) < n:
+                chunk = sock.recv(n - len(data))
+                self.assertTrue(chunk, "connection closed")
+                data += chunk
+            return data
+        (length,) = telemetry.LENGTH.unpack(read_exactly(telemetry.LENGTH.size))
+        return read_exactly(length)
+
+    def test_state_and_injection(self):
+        import socket
+        scheduler = Scheduler()
+        task = scheduler.add(Robot(x=10, y=20, heading=90), [(DRIVE, FORWARD, 5, 10)])
+        with telemetry.TelemetryServer(rate=200) as server, \
+                socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+            scheduler.step(0.1)
+            server.publish(scheduler.sim_time, scheduler.tasks)
+            payload = self.read_message(sock)
+            self.assertEqual(payload[0], telemetry.STATE)
+            sim_time, robots = telemetry.decode_state(payload)
+            self.assertAlmostEqual(sim_time, 0.1)
+            self.assertAlmostEqual(robots[0]["y"], 21, places=4)
+            self.assertAlmostEqual(robots[0]["gps_heading"], 0)
+            self.assertEqual(robots[0]["command"], "DRIVE FORWARD 5 10")
+
+            sock.sendall(telemetry.encode_command(0, "bogus 1 2"))
+            payload = self.read_message(sock)
+            self.assertEqual(payload[0], telemetry.ERROR)
+            self.assertIn("telemetry:1:", payload[1:].decode())
+
+            scheduler.run()
+            self.assertTrue(scheduler.done)
+            sock.sendall(telemetry.encode_command(0, "TURN LEFT 90 90\nDRIVE FORWARD 10 20"))
+            (robot_index, cmds), = self.poll(server, telemetry.extend_tasks(scheduler.tasks))
+            self.assertEqual(robot_index, 0)
+            payload = self.read_message(sock)
+            self.assertEqual(payload, bytes([telemetry.ACK]) + (2).to_bytes(2, "little"))
+            self.assertFalse(scheduler.done)
+            scheduler.run()
+            self.assertTrue(scheduler.done)
+            self.assertAlmostEqual(task.robot.heading, 90 + 90, delta=2)
+            self.assertAlmostEqual(task.robot.x, 10 - 10, delta=2)
+            self.assertEqual(server.poll(telemetry.extend_tasks(scheduler.tasks)), [])
+
+    def poll(self, server, accept):
+        # commands reach the queue a moment after the client sends them
+        for _ in range(500):
+            if not server.commands.empty():
+                break
+            time.sleep(0.01)
+        return server.poll(accept)
+
+    def test_rejected_commands(self):
+        import socket
+        world = CollisionWorld.field(800, 800)
+        world.add_static(OrientedRect(0, 0, 40, 500), "barrier")
+        scheduler = Scheduler(planner=Planner(world))
+        scheduler.add(Robot(x=-200, y=0), [])
+        accept = telemetry.extend_tasks(scheduler.tasks)
+        with telemetry.TelemetryServer(rate=200) as server, \
+                socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+            for robot_index, text, error in [(7, "DRIVE FORWARD 10 20", "no robot 7"),
+                                             (0, "PLANTO 0 0 30", "inside an obstacle")]:
+                sock.sendall(telemetry.encode_command(robot_index, text))
+                self.assertEqual(self.poll(server, accept), [])
+                payload = self.read_message(sock)
+                while payload[0] == telemetry.STATE:
+                    payload = self.read_message(sock)
+                self.assertEqual(payload[0], telemetry.ERROR)
+                self.assertIn(error, payload[1:].decode())
+            self.assertEqual(scheduler.tasks[0].executor.cmds, [])
+
+            # a COMMAND too short to hold a robot index is answered, not a crash
+            sock.sendall(telemetry.pack(bytes([telemetry.COMMAND])))
+            payload = self.read_message(sock)
+            self.assertEqual(payload[0], telemetry.ERROR)
+            self.assertIn("too short", payload[1:].decode())
+
+    def test_close_with_client_connected(self):
+        import socket
+        server = telemetry.TelemetryServer(rate=200).start()
+        with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+            for _ in range(100):
+                if server.clients:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(server.clients, 1)
+            server.close()
+            self.assertFalse(server.thread.is_alive())
+            self.assertEqual(server.connections, {})
+            self.assertEqual(sock.recv(1), b"")  # the server hung up
+
+    def test_coalescing(self):
+        import socket
+        scheduler = Scheduler()
+        scheduler.add(Robot(), [])
+        with telemetry.TelemetryServer(rate=50) as server:
+            # many frames between sends only deliver the newest
+            for i in range(1000):
+                server.publish(i, scheduler.tasks)
+            with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+                sim_time, _ = telemetry.decode_state(self.read_message(sock))
+                self.assertEqual(sim_time, 999)
+                self.assertLessEqual(server.sent, 2)
+
+
+class TestHotReload(unittest.TestCase):
+
+    cmds = [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 20), (GOTO, 100, 100, 10)]
+    edited = [(DRIVE, FORWARD, 20, 10), (TURN, LEFT, 90, 20), (GOTO, 100, 100, 10)]
+
+    def test_first_changed(self):
+        self.assertIsNone(first_changed(self.cmds, list(self.cmds)))
+        self.assertEqual(first_changed(self.cmds, self.edited), 1)
+        self.assertEqual(first_changed(self.cmds, self.cmds[:2]), 2)
+        self.assertEqual(first_changed(self.cmds, self.cmds + [(DRIVE, REVERSE, 5, 5)]), 3)
+
+    def test_watcher(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "auton.txt")
+            with open(path, "w") as f:
+                f.write("DRIVE FORWARD 20 10\n")
+            watcher = RoutineWatcher(path, poll_interval=1.0)
+            self.assertEqual(watcher.load(), [(DRIVE, FORWARD, 20, 10)])
+            self.assertIsNone(watcher.check(0))
+
+            with open(path, "w") as f:
+                f.write("DRIVE FORWARD 20 10\nTURN RIGHT 90 20\n")
+            self.assertIsNone(watcher.check(0.5))  # too soon after the last check
+            self.assertEqual(watcher.check(1.0), [(DRIVE, FORWARD, 20, 10), (TURN, RIGHT, 90, 20)])
+
+            with open(path, "w") as f:
+                f.write("DRIVE FORWARD 20 10\nHOVER 3\n")
+            self.assertIsNone(watcher.check(2.0))
+            self.assertIn("auton.txt:2", watcher.error)
+
+    def run_to_turn(self):
+        scheduler = Scheduler()
+        task = scheduler.add(Robot(x=300, y=300), self.cmds)
+        start_poses = StartPoses()
+        # part way through the TURN
+        while not (task.executor.cmd_index == 1 and task.executor.current_pos is not None):
+            start_poses.record(task)
+            scheduler.step(1 / 60)
+        for _ in range(10):
+            start_poses.record(task)
+            scheduler.step(1 / 60)
+        return scheduler, task, start_poses
+
+    def test_reload_task_rewinds(self):
+        scheduler, task, start_poses = self.run_to_turn()
+        self.assertEqual(reload_task(task, self.edited, start_poses), 1)
+        self.assertEqual((task.robot.x, task.robot.y, task.robot.heading), start_poses.poses[1])
+        self.assertEqual(len(task.cmd_end_times), 1)
+        result, = scheduler.run()
+        expected = run_headless(Robot(x=300, y=300), self.edited)
+        self.assertTrue(result.completed)
+        for value, expected_value in zip(result.final_pose, expected.final_pose):
+            self.assertAlmostEqual(value, expected_value, places=6)
+
+        scheduler, task, start_poses = self.run_to_turn()
+        self.assertEqual(reload_task(task, self.edited, start_poses, rewind=START), 0)
+        self.assertEqual((task.robot.x, task.robot.y, task.robot.heading), (300, 300, 0))
+
+    def test_reload_task_later_edit(self):
+        scheduler, task, start_poses = self.run_to_turn()
+        heading = task.robot.heading
+        edited = self.cmds[:2] + [(GOTO, -100, 100, 10)]
+        self.assertIsNone(reload_task(task, edited, start_poses))
+        self.assertEqual(task.robot.heading, heading)
+        result, = scheduler.run()
+        self.assertTrue(result.completed)
+        self.assertAlmostEqual(result.final_pose[0], -100, delta=2)
+
+    def test_reload_running_planto(self):
+        scheduler = Scheduler()
+        task = scheduler.add(Robot(x=0, y=0), [(PLANTO, 200, 0, 20)])
+        start_poses = StartPoses()
+        for _ in range(30):
+            start_poses.record(task)
+            scheduler.step(1 / 60)
+        self.assertEqual(reload_task(task, [(PLANTO, -200, 0, 20)], start_poses), 0)
+        self.assertIsNone(task.executor.waypoints)
+        self.assertEqual((task.robot.x, task.robot.y), (0, 0))
+        result, = scheduler.run()
+        self.assertTrue(result.completed)
+        self.assertAlmostEqual(result.x, -200, delta=2)
+
+    def test_reloadable_run(self):
+        run = ReloadableRun(Robot(x=300, y=300), self.cmds)
+        self.assertTrue(run.run().completed)
+        edited = self.cmds[:2] + [(GOTO, -100, 100, 10)]
+        result = run.reload(edited)
+        self.assertEqual(run.resumed_from, 2)
+        expected = run_headless(Robot(x=300, y=300), edited)
+        self.assertEqual(result.final_pose, expected.final_pose)
+        self.assertEqual(result.cmd_end_times, expected.cmd_end_times)
+        self.assertEqual(result.trajectory, expected.trajectory)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,167 @@
+# trajectory_log.py
+# Compact append-only binary trajectory logs.
+#
+# A log file is a 16 byte header followed by fixed size RECORD_DTYPE records, one per step.
+# A small keyframe index (path + ".idx") holds (time, record) pairs every KEYFRAME_INTERVAL
+# records and whenever the command changes, so a reader can seek without scanning the log.
+
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"VEXTRJ01"
+HEADER = struct.Struct("<8sII")  # magic, record size, keyframe interval
+KEYFRAME_INTERVAL = 256  # records between keyframes
+BUFFER_RECORDS = 4096  # records held in memory before they are written
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("heading", "<f4"),
+    ("velocity", "<f4"),
+    ("heading_velocity", "<f4"),
+    ("cmd_index", "<i4"),
+])
+KEYFRAME_DTYPE = np.dtype([("time", "<f8"), ("record", "<i8")])
+
+
+def index_path(path):
+    return str(path) + ".idx"
+
+
+class TrajectoryWriter:
+    """
+    Writes one record per step to a log file. Use as a context manager, or call close().
+    An existing log is replaced, unless append=True, which continues it; times must keep increasing.
+    """
+
+    def __init__(self, path, keyframe_interval=KEYFRAME_INTERVAL, append=False):
+        self.path = path
+        mode = "ab" if append else "wb"
+        self.file = open(path, mode)
+        self.index_file = open(index_path(path), mode)
+        self.last_time = None
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, keyframe_interval))
+            self.keyframe_interval = keyframe_interval
+            self.count = 0
+        else:
+            header = read_header(path)
+            self.keyframe_interval = header[2]
+            self.count = (self.file.tell() - HEADER.size) // RECORD_DTYPE.itemsize
+            if self.count:
+                self.last_time = float(TrajectoryLog(path).records["time"][-1])
+        self.buffer = np.zeros(BUFFER_RECORDS, dtype=RECORD_DTYPE)
+        self.buffered = 0
+        self.keyframes = []
+        self.last_cmd_index = None
+
+    def append(self, time, x, y, heading, velocity, heading_velocity, cmd_index):
+        # seek() binary searches on time, so it has to increase
+        if self.last_time is not None and time <= self.last_time:
+            raise ValueError(f"record time {time} is not after the last record time {self.last_time}")
+        self.last_time = time
+        record = self.count + self.buffered
+        if record % self.keyframe_interval == 0 or cmd_index != self.last_cmd_index:
+            self.keyframes.append((time, record))
+        self.last_cmd_index = cmd_index
+        self.buffer[self.buffered] = (time, x, y, heading, velocity, heading_velocity, cmd_index)
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def append_robot(self, time, robot, cmd_index):
+        self.append(time, robot.x, robot.y, robot.heading, robot.velocity, robot.heading_velocity, cmd_index)
+
+    def flush(self):
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.file.flush()
+        self.count += self.buffered
+        self.buffered = 0
+        if self.keyframes:
+            self.index_file.write(np.array(self.keyframes, dtype=KEYFRAME_DTYPE).tobytes())
+            self.index_file.flush()
+            self.keyframes = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        magic, record_size, keyframe_interval = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a trajectory log")
+    return magic, record_size, keyframe_interval
+
+
+class TrajectoryLog:
+    """
+    Memory mapped view of a log written by TrajectoryWriter.
+    Records are only read from disk when they are accessed.
+    """
+
+    def __init__(self, path):
+        read_header(path)
+        self.path = path
+        size = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+        if size:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(size,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        try:
+            self.keyframes = np.fromfile(index_path(path), dtype=KEYFRAME_DTYPE)
+        except FileNotFoundError:
+            self.keyframes = np.zeros(0, dtype=KEYFRAME_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+    @property
+    def duration(self):
+        return float(self.records["time"][-1]) if len(self.records) else 0.0
+
+    def seek(self, time):
+        """
+        Index of the first record at or after time.
+        """
+        start = 0
+        end = len(self.records)
+        if len(self.keyframes):
+            k = np.searchsorted(self.keyframes["time"], time, side="right") - 1
+            if k >= 0:
+                start = int(self.keyframes["record"][k])
+            if k + 1 < len(self.keyframes):
+                end = int(self.keyframes["record"][k + 1]) + 1
+        # only the records between two keyframes are touched
+        return start + int(np.searchsorted(self.records["time"][start:end], time, side="left"))
+
+    def command_starts(self):
+        """
+        (time, record) for every keyframe where the command changed.
+        """
+        records = self.keyframes["record"]
+        cmd_index = self.records["cmd_index"][records] if len(records) else records
+        changed = np.ones(len(records), dtype=bool)
+        changed[1:] = cmd_index[1:] != cmd_index[:-1]
+        return self.keyframes[changed]
+
+    def frames(self, start_time=0.0, stride=1):
+        """
+        Stream records from start_time onwards, every stride'th record.
+        """
+        for i in range(self.seek(start_time), len(self.records), stride):
+            yield self.records[i]
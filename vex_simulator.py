@@ -8,51 +8,71 @@ import pygame
 # Calculate the angle from pos1 to pos2 in degrees (0° is along positive x-axis, CCW positive)
 
 from robot import Robot
-from utils import angle_between_positions, cartesian_cw_or_ccw, cartesian_heading_to_gps, cartesian_to_screen
-from utils import add_distance, find_distance, smallest_angle_difference
-from utils import CW, CCW
+from utils import cartesian_heading_to_gps, cartesian_to_screen
+from sprite_cache import rotation_cache, image_key
+from field_layer import FieldLayer, BLACK
+from hud import Hud
+from trajectory_log import TrajectoryWriter
+from profiler import NullProfiler, PHASES
+from collision import CollisionWorld
+from planner import Planner
+from scheduler import Scheduler
+from headless import DEFAULT_MAX_TIME
+from telemetry import extend_tasks
+from hot_reload import RoutineWatcher, StartPoses, reload_task, CACHED
+from commands import DRIVE, GOTO, SPINTO, MAIN_CMDS
 
 # Screen dimensions
 WIDTH, HEIGHT = 800, 800
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
 
 ROBOT_SIZE = 50  # Size of the robot image
+OVERLAY_REFRESH_FRAMES = 30  # frames between profiler overlay updates
 
 
 
-# COMMANDS
-DRIVE = "DRIVE"
-TURN = "TURN"
-FORWARD = "FORWARD"
-REVERSE = "REVERSE"
-RIGHT = "RIGHT"
-LEFT = "LEFT"
-GOTO = "GOTO"
-SPINTO = "SPINTO"
-
-
-
-def draw_robot(screen, robot):
-    # Rotate the robot image according to heading
-    rotated_img = pygame.transform.rotate(robot.robot_img, robot.heading)
+def draw_robot(screen, robot, cache=rotation_cache):
+    # Rotate the robot image according to heading, reusing cached rotations
+    rotated_img = cache.get(image_key(robot), robot.robot_img, robot.heading)
     rotated_rect = rotated_img.get_rect(center=(robot.robot_rect.center))
     # Convert field (cartesian) coordinates to screen coordinates for the center
     screen_center = cartesian_to_screen(robot.x, robot.y, WIDTH, HEIGHT)
     rotated_rect.center = screen_center
-    screen.blit(rotated_img, rotated_rect)
+    return screen.blit(rotated_img, rotated_rect)
+
+
+
+def announce_command(name, start_time):
+    def on_start(cmd_index, cmd_info):
+        elapsed_seconds = int(time.time() - start_time)
+        print(f"Time {elapsed_seconds}s: {name} starting command {cmd_index}: {cmd_info}")
+    return on_start
+
 
+def run_simulator(robot, cmds, log_file=None, profiler=None, world=None, planner=None, exporter=None, max_time=None,
+                  telemetry=None, routine_file=None, rewind=CACHED):
+    run_match([(robot, cmds)], log_file=log_file, profiler=profiler, world=world, planner=planner, exporter=exporter,
+              max_time=max_time, telemetry=telemetry, routine_file=routine_file, rewind=rewind)
 
 
-def draw_text(screen, text, x, y, font):
-    text_surface = font.render(text, True, BLACK)
-    text_rect = text_surface.get_rect()
-    text_rect.bottomleft = (x, y)
-    screen.blit(text_surface, text_rect)
+def run_match(robot_cmds, log_file=None, profiler=None, world=None, planner=None, exporter=None, max_time=None,
+              telemetry=None, routine_file=None, rewind=CACHED):
+    """
+    Run several robots at once, robot_cmds is a list of (robot, cmds).
+    The HUD and the trajectory log follow the first robot.
 
+    With an exporter (a frame_export.FrameExporter) nothing is shown: every frame is drawn
+    off-screen and handed to the exporter, time advances by 1 / exporter.fps per frame
+    as fast as the frames can be drawn, and the run ends once every robot is done
+    or after max_time seconds (DEFAULT_MAX_TIME by default).
 
+    With a started telemetry.TelemetryServer every frame is published to its clients,
+    and commands they send are added to the end of that robot's command list (see telemetry.extend_tasks).
 
-def run_simulator(robot, cmds):
+    With a routine_file the first robot runs the commands in that file instead of its cmds,
+    and picks up edits to it while running, see hot_reload.py.
+    """
+    if not robot_cmds:
+        raise ValueError("run_match needs at least one (robot, cmds) pair")
 
     # Initialize pygame
     pygame.init()
@@ -60,8 +80,18 @@ def run_simulator(robot, cmds):
 
 
     # Create the screen
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption('VEX Robot Simulator')
+    offscreen = exporter is not None
+    if offscreen:
+        screen = pygame.Surface((WIDTH, HEIGHT))
+        if max_time is None:
+            max_time = DEFAULT_MAX_TIME
+    else:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption('VEX Robot Simulator')
+    # the field never changes, so draw it once
+    field = FieldLayer(WIDTH, HEIGHT)
+    # HUD lines, bottom left corners
+    hud = Hud([(5, HEIGHT - 80), (5, HEIGHT - 55), (5, HEIGHT - 30), (5, HEIGHT - 5)])
 
 
 
@@ -69,195 +99,150 @@ def run_simulator(robot, cmds):
     start_time = time.time()
     clock = pygame.time.Clock()
 
+    # optional binary log of every frame, see replay.py
+    recorder = TrajectoryWriter(log_file) if log_file else None
 
+    # optional per-phase timing, shown in the top right corner (F3 toggles it)
+    show_overlay = profiler is not None
+    if profiler is None:
+        profiler = NullProfiler()
+    overlay = Hud([(WIDTH - 250, 20 + 18 * i) for i in range(len(PHASES) + 2)], font_size=20) if show_overlay else None
+    overlay_lines = []
 
-    cmd_index = 0
-    prev_cmd_index = 0
-    current_pos = None
-    target_pos = None
-    pos_tolerance = 2  # units
+
+
+    # optional routine file for the first robot, reloaded when it changes
+    watcher = None
+    if routine_file is not None:
+        watcher = RoutineWatcher(routine_file)
+        robot_cmds = [(robot_cmds[0][0], watcher.load())] + list(robot_cmds[1:])
+        start_poses = StartPoses()
+        reported_error = None
+
+    scheduler = Scheduler(world=world, planner=planner, record=False)
+    for i, (robot, cmds) in enumerate(robot_cmds):
+        name = f"robot {i}"
+        scheduler.add(robot, cmds, name=name, verbose=True, on_start=announce_command(name, start_time))
+    robot, executor = scheduler.tasks[0].robot, scheduler.tasks[0].executor
+    reported_errors = {}
 
     # Main loop
     running = True
     while running:
 
-        screen.fill(WHITE)
-
         # manage time
-        dt = clock.tick(60) / 1000.0  # Delta time in seconds
-        elapsed_seconds = int(time.time() - start_time)
+        if offscreen:
+            # fixed steps, no waiting on the wall clock
+            if scheduler.done or scheduler.sim_time >= max_time:
+                break
+            dt = 1.0 / exporter.fps
+        else:
+            dt = clock.tick(60) / 1000.0  # Delta time in seconds
+        profiler.begin_frame()
+
+        field.begin_frame(screen)
+        profiler.lap("field")
 
         # process events
-        for event in pygame.event.get():
+        for event in pygame.event.get() if not offscreen else ():
             if event.type == pygame.QUIT:
                 running = False
-
-        # what's our current command?
-        current_cmd_info = cmds[cmd_index] if cmd_index < len(cmds) else None
-        if not current_cmd_info:
-            current_cmd = None
-        else:
-            current_cmd = current_cmd_info[0]
-
-        if prev_cmd_index != cmd_index:
-            print( f"Time {elapsed_seconds}s: Starting command {cmd_index}: {current_cmd_info}")
-            prev_cmd_index = cmd_index
-
-        # process current command
-        if current_cmd == DRIVE:
-            # get command details
-            current_cmd, direction, distance, velocity = current_cmd_info
-            if current_pos is None:
-                current_pos = robot.x, robot.y
-                target_pos = add_distance(current_pos, direction, distance, robot)
-
-            # draw target position
-            screen_target = cartesian_to_screen(*target_pos, WIDTH, HEIGHT)
-            pygame.draw.circle(screen, BLACK, screen_target, 10, 2)
-            dir_sign = 1 if direction == FORWARD else -1
-            robot.velocity = velocity * dir_sign
-            robot.heading_velocity = 0
-            # are we there yet?
-            dist_to_target = find_distance((robot.x, robot.y), target_pos)
-            if dist_to_target <= pos_tolerance:
-                # Stop the robot
-                robot.velocity = 0
-                robot.heading_velocity = 0
-                # Move to next command
-                cmd_index += 1
-                current_pos = None
-                target_pos = None
-
-        elif current_cmd == TURN:
-            current_cmd, direction, distance, velocity = current_cmd_info
-            if current_pos is None:
-                current_pos = robot.heading
-                target_pos = current_pos + (distance if direction == LEFT else -distance)
-                robot.velocity = 0
-                robot.heading_velocity = velocity if direction == LEFT else -velocity
-
-            # screen_target = cartesian_to_screen(*target_pos)
-            # pygame.draw.circle(screen, BLACK, screen_target, 10, 2)
-            # are we there yet?
-            heading_diff = abs(robot.heading - target_pos)
-            if heading_diff <= 2:  # degrees tolerance
-                # Stop the robot
-                robot.velocity = 0
-                robot.heading_velocity = 0
-                # Move to next command
-                cmd_index += 1
-                current_pos = None
-                target_pos = None
-
-        elif current_cmd == GOTO:
-            current_cmd, target_x, target_y, velocity = current_cmd_info
-            # if current_pos is None:
-            current_pos = (robot.x, robot.y)
-            target_pos = (target_x, target_y)
-            # draw target position
-            screen_target = cartesian_to_screen(*target_pos, WIDTH, HEIGHT)
-            pygame.draw.circle(screen, BLACK, screen_target, 10, 2)
-            # determine how to turn
-            angle_to_target = angle_between_positions((robot.x, robot.y), target_pos)
-            angle_diff, direction = smallest_angle_difference(angle_to_target, robot.heading)
-            if abs(angle_diff) < 1.0:
-                # stop turning
-                robot.heading_velocity = 0
-            else:
-                if direction == CCW:
-                    robot.heading_velocity = velocity
-                else:
-                    robot.heading_velocity = -velocity
-
-            # drive forward towards target
-            robot.velocity = velocity
-
-            # are we there yet?
-            dist_to_target = find_distance((robot.x, robot.y), target_pos)
-            if dist_to_target <= pos_tolerance:
-                # Stop the robot
-                robot.velocity = 0
-                robot.heading_velocity = 0
-                # Move to next command
-                cmd_index += 1
-                current_pos = None
-                target_pos = None
-
-        elif current_cmd == SPINTO:
-            if current_pos is None:
-                first_time = True
-            else:
-                first_time = False
-            current_cmd, target_x, target_y, velocity = current_cmd_info
-            current_pos = (robot.x, robot.y)
-            target_pos = (target_x, target_y)
-            # draw target position
-            screen_target = cartesian_to_screen(*target_pos)
-            pygame.draw.circle(screen, BLACK, screen_target, 10, 2)
-
-            # determine how to turn
-            angle_to_target = angle_between_positions((robot.x, robot.y), target_pos)
-            robot.velocity = 0
-            angle_diff, direction = smallest_angle_difference(angle_to_target, robot.heading)
-            if first_time:
-                print(f"robot pos={current_pos} target_pos={target_pos}  ")
-                print( "angle_to_target=", angle_to_target, " robot.heading=", robot.heading, " angle_diff=", angle_diff)
-            if abs(angle_diff) < 1.0:
-                robot.heading_velocity = 0
-                # go to next command
-                cmd_index += 1
-                current_pos = None
-                target_pos = None
-            else:
-                if first_time:
-                    print(" direction=", direction)
-                if direction == CCW:
-                    robot.heading_velocity = velocity
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and overlay is not None:
+                show_overlay = not show_overlay
+        profiler.lap("events")
+
+        if telemetry is not None:
+            # clients are told whether their commands were taken
+            telemetry.poll(extend_tasks(scheduler.tasks))
+
+        if watcher is not None:
+            start_poses.record(scheduler.tasks[0])
+            new_cmds = watcher.check(time.time())
+            if new_cmds is not None:
+                try:
+                    restart = reload_task(scheduler.tasks[0], new_cmds, start_poses, rewind=rewind)
+                except ValueError as e:
+                    print(f"not reloaded, {e}")
                 else:
-                    robot.heading_velocity = -velocity
-
-        # Update robot position
-        robot.update_position(dt)
-
-
-        # Draw border lines
-        pygame.draw.line(screen, BLACK, (0, 0), (WIDTH, 0), 3)           # Top
-        pygame.draw.line(screen, BLACK, (0, 0), (0, HEIGHT), 3)          # Left
-        pygame.draw.line(screen, BLACK, (0, HEIGHT-1), (WIDTH, HEIGHT-1), 3)  # Bottom
-        pygame.draw.line(screen, BLACK, (WIDTH-1, 0), (WIDTH-1, HEIGHT), 3)   # Right
-
-        # Draw center vertical and horizontal lines
-        pygame.draw.line(screen, BLACK, (WIDTH // 2, 0), (WIDTH // 2, HEIGHT), 2)  # Vertical center
-        pygame.draw.line(screen, BLACK, (0, HEIGHT // 2), (WIDTH, HEIGHT // 2), 2)  # Horizontal center
-
-        draw_robot(screen, robot)
+                    where = f"restarting from command {restart}" if restart is not None else "carrying on"
+                    print(f"reloaded {routine_file}, {where}")
+            if watcher.error != reported_error:
+                reported_error = watcher.error
+                if reported_error is not None:
+                    print(f"not reloaded, {reported_error}")
 
+        # what's our current command?
+        current_cmd_info = executor.current_cmd_info
+
+        # process every robot's current command
+        scheduler.advance()
+        for task in scheduler.tasks:
+            if task.error is not None and task.error != reported_errors.get(task.name):
+                # the robot has stopped, the rest keep going
+                reported_errors[task.name] = task.error
+                print(f"{task.name} stopped: {task.error}")
+
+        # draw target positions
+        for task in scheduler.tasks:
+            # a PLANTO shows the waypoint it is heading for
+            task_executor = task.executor.waypoints or task.executor
+            task_cmd_info = task_executor.current_cmd_info
+            if task_cmd_info and task_cmd_info.cmd in (DRIVE, GOTO, SPINTO) and task_executor.target_pos is not None:
+                screen_target = cartesian_to_screen(*task_executor.target_pos, WIDTH, HEIGHT)
+                field.mark(pygame.draw.circle(screen, BLACK, screen_target, 10, 2))
+        profiler.lap("commands")
+
+        # Update robot positions, keeping robots out of walls, field elements and each other
+        scheduler.move(dt)
+        # a frame that took under a millisecond moved nothing, and log times must increase
+        if recorder is not None and dt > 0:
+            recorder.append_robot(scheduler.sim_time, robot, executor.cmd_index)
+        if telemetry is not None:
+            telemetry.publish(scheduler.sim_time, scheduler.tasks)
+        profiler.lap("update_position")
+
+        for task in scheduler.tasks:
+            field.mark(draw_robot(screen, task.robot))
+        profiler.lap("draw_robot")
 
 
         # Display the current_cmd_info tuple above 'screen pos:'
-        font = pygame.font.SysFont(None, 24)
-        if current_cmd_info:
-            cmd_info_text = f"cmd: {current_cmd_info}"
-            draw_text(screen, cmd_info_text, 5, HEIGHT - 80, font)
+        cmd_info_text = f"cmd: {current_cmd_info}" if current_cmd_info else None
 
         # Display the robot's heading
         # gps_heading = (robot.heading - 90.0) * -1. # % 360  # Adjust heading to GPS convention
         gps_heading = cartesian_heading_to_gps(robot.heading)
         heading_text = f"heading: {int(robot.heading)}, gps heading: {int(gps_heading)}°"
-        draw_text(screen, heading_text, 5, HEIGHT - 55, font)
 
         # Display the robot's pygame screen position above the field pos
-        # font = pygame.font.SysFont(None, 24)
         screen_x, screen_y = cartesian_to_screen(robot.x, robot.y)
         screen_pos_text = f"screen pos: ({int(screen_x)}, {int(screen_y)})"
-        draw_text(screen, screen_pos_text, 5, HEIGHT - 30, font)
 
         # Display the robot's x and y position in the lower left corner
         pos_text = f"field pos: ({int(robot.x)}, {int(robot.y)})"
-        draw_text(screen, pos_text, 5, HEIGHT - 5, font)
 
-        pygame.display.flip()
+        for rect in hud.draw(screen, [cmd_info_text, heading_text, screen_pos_text, pos_text]):
+            field.mark(rect)
+
+        if show_overlay:
+            # percentiles only move slowly, refreshing them every frame would just re-render text
+            if profiler.frame % OVERLAY_REFRESH_FRAMES == 0:
+                overlay_lines = profiler.overlay_lines()
+            for rect in overlay.draw(screen, overlay_lines):
+                field.mark(rect)
+        profiler.lap("hud")
 
+        if offscreen:
+            field.finish_frame()
+            exporter.submit(screen)
+        else:
+            # only push the regions that changed
+            field.end_frame()
+        profiler.lap("display")
+        profiler.end_frame()
+
+    if recorder is not None:
+        recorder.close()
     pygame.quit()
 
 def main():
@@ -278,14 +263,7 @@ def main():
         image_height=50
     )
 
-    cmds = [
-        (DRIVE, FORWARD, 20, 10),  # drive forward at 5 units/sec for 20 units
-        (DRIVE, REVERSE, 20, 10),  # drive forward at 5 units/sec for 20 units
-        (TURN, RIGHT, 90, 20),    # turn right at 90 deg/sec
-        (SPINTO, 350, 250, 20),
-        (GOTO, 100, 100, 10),    # go to (100, 100) at 510units/sec
-        # (DRIVE, FORWARD, 5, 2),  # drive
-    ]
+    cmds = list(MAIN_CMDS)
 
     cmds2 = [
         # (SPINTO, 300, 300, 20),
@@ -297,7 +275,8 @@ def main():
         (SPINTO, -200, 200, 20),
 
     ]
-    run_simulator(robot, cmds)
+    world = CollisionWorld.field(WIDTH, HEIGHT)
+    run_simulator(robot, cmds, world=world, planner=Planner(world, WIDTH, HEIGHT))
 
 
 if __name__ == "__main__":